@@ -0,0 +1,190 @@
+"""Pick the worker count and thread settings that extract posters fastest here.
+
+OpenCV's FFmpeg decoder and cv2 operations each start their own thread
+pools, so N worker processes on an N-core machine can oversubscribe the
+CPU and run slower than fewer workers. calibrate() times a small sample
+of the queue under several (workers, cv2_threads, decoder_threads)
+combinations and keeps the fastest. The choice is saved per machine in
+TUNING_PATH, and both tools pick it up on later runs:
+
+    python auto_tune.py clips/ --sample 8
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+
+import poster_extractor
+from poster_encoders import DEFAULT_ENCODER, encode_poster, get_encoder
+
+TUNING_PATH = Path.home() / '.video-poster-extractor' / 'tuning.json'
+TUNING_VERSION = 1
+
+# Videos timed for each candidate setting
+SAMPLE_SIZE = 8
+
+
+def machine_key():
+    """Identify this machine and OpenCV build, so a shared home folder keeps one tuning per machine"""
+    return f"{platform.node()}|{platform.machine()}|{os.cpu_count()}|opencv-{poster_extractor.cv2.__version__}"
+
+
+def load_tuning(path=TUNING_PATH):
+    """The saved tuning for this machine, e.g. {'workers': 4, 'cv2_threads': 1, ...}, or None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != TUNING_VERSION:
+        return None
+    return data.get('machines', {}).get(machine_key())
+
+
+def save_tuning(tuning, path=TUNING_PATH):
+    """Save tuning for this machine, keeping other machines' entries"""
+    path = Path(path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or data.get('version') != TUNING_VERSION:
+            data = None
+    except (OSError, ValueError):
+        data = None
+    if data is None:
+        data = {'version': TUNING_VERSION, 'machines': {}}
+    data['machines'][machine_key()] = tuning
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def tuned_threads(tuning, workers):
+    """The tuned (cv2_threads, decoder_threads) pair, if tuning was calibrated for this worker count"""
+    if not tuning or tuning.get('workers') != workers:
+        return None
+    return tuning.get('cv2_threads'), tuning.get('decoder_threads')
+
+
+def candidate_settings(cpu_count=None):
+    """(workers, cv2_threads, decoder_threads) combinations worth timing
+
+    For each worker count (powers of two up to the CPU count, plus the CPU
+    count itself), try the library defaults and an even split of the
+    cores between workers.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    worker_counts = sorted({1 << i for i in range(cpu_count.bit_length()) if 1 << i <= cpu_count} | {cpu_count})
+    candidates = []
+    for workers in worker_counts:
+        candidates.append((workers, None, None))
+        candidates.append((workers, 1, max(1, cpu_count // workers)))
+    return candidates
+
+
+def _calibration_job(video_path, position_percent, output_size, seek_mode, encoder_name, quality):
+    """Decode, render and encode one poster in memory, without writing it"""
+    frame, _, _ = poster_extractor.read_frame(video_path, position_percent, seek_mode)
+    if frame is None:
+        return False
+    poster = poster_extractor.render_frame(frame, output_size)
+    encode_poster(poster, get_encoder(encoder_name), quality)
+    return True
+
+
+def sample_videos(video_paths, sample_size=SAMPLE_SIZE):
+    """Up to sample_size videos spread evenly over the queue"""
+    video_paths = list(video_paths)
+    if len(video_paths) <= sample_size:
+        return video_paths
+    step = len(video_paths) / sample_size
+    return [video_paths[int(i * step)] for i in range(sample_size)]
+
+
+def time_setting(sample, setting, job_args):
+    """Seconds to process sample with one (workers, cv2_threads, decoder_threads) setting"""
+    workers, cv2_threads, decoder_threads = setting
+    start = time.perf_counter()
+    # A fresh pool each time, so thread settings never leak between candidates
+    with poster_extractor.worker_pool(workers, (cv2_threads, decoder_threads)) as executor:
+        list(executor.map(_calibration_job, sample, *[[arg] * len(sample) for arg in job_args]))
+    return time.perf_counter() - start
+
+
+def calibrate(video_paths, position_percent=25, output_size=(640, 360), seek_mode=poster_extractor.SEEK_EXACT,
+              encoder=DEFAULT_ENCODER, quality=85, sample_size=SAMPLE_SIZE, candidates=None, on_status=None):
+    """Time each candidate setting on a sample of video_paths and return the fastest as a tuning dict
+
+    The tuning dict has 'workers', 'cv2_threads', 'decoder_threads' (None
+    meaning the library default), 'files_per_second' and 'results', the
+    timings of every candidate. Returns None if there is nothing to sample.
+    """
+    candidates = candidates or candidate_settings()
+    # Give the largest pool at least one video per worker
+    sample = sample_videos(video_paths, max(sample_size, max(setting[0] for setting in candidates)))
+    if not sample:
+        return None
+    job_args = (position_percent, output_size, seek_mode, encoder, quality)
+
+    # Warm the page cache so the first candidate isn't penalised
+    for video_path in sample:
+        _calibration_job(video_path, *job_args)
+
+    results = []
+    for setting in candidates:
+        if on_status:
+            on_status(f"Calibrating: {setting[0]} workers, cv2 threads {setting[1] or 'default'}, "
+                      f"decoder threads {setting[2] or 'default'}...")
+        seconds = time_setting(sample, setting, job_args)
+        results.append({'workers': setting[0], 'cv2_threads': setting[1], 'decoder_threads': setting[2],
+                        'files_per_second': round(len(sample) / seconds, 2)})
+
+    best = max(results, key=lambda result: result['files_per_second'])
+    return dict(best, sample_size=len(sample), tuned_at=time.strftime('%Y-%m-%dT%H:%M:%S'), results=results)
+
+
+def format_results(tuning):
+    """One line per candidate, the chosen one marked"""
+    lines = [f"{'workers':>7} {'cv2 threads':>11} {'decoder':>8} {'files/s':>8}"]
+    for result in tuning['results']:
+        chosen = result['workers'] == tuning['workers'] and result['cv2_threads'] == tuning['cv2_threads'] \
+            and result['decoder_threads'] == tuning['decoder_threads']
+        lines.append(f"{result['workers']:>7} {result['cv2_threads'] or 'default':>11} "
+                     f"{result['decoder_threads'] or 'default':>8} {result['files_per_second']:>8.2f}"
+                     f"{'  <- chosen' if chosen else ''}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help="MP4 files and/or folders to sample")
+    parser.add_argument('-r', '--recursive', action='store_true', help="search folders recursively")
+    parser.add_argument('--sample', type=int, default=SAMPLE_SIZE,
+                        help=f"videos timed per candidate (default: {SAMPLE_SIZE})")
+    parser.add_argument('--seek', choices=poster_extractor.SEEK_MODES, default=poster_extractor.SEEK_EXACT,
+                        help="seek strategy to calibrate with (default: exact)")
+    parser.add_argument('--dry-run', action='store_true', help="print the results without saving them")
+    args = parser.parse_args(argv)
+
+    videos = poster_extractor.find_videos(args.paths, recursive=args.recursive)
+    tuning = calibrate(videos, seek_mode=args.seek, sample_size=args.sample,
+                       on_status=lambda text: print(text, file=sys.stderr, flush=True))
+    if tuning is None:
+        print("No MP4 files found", file=sys.stderr)
+        return 1
+
+    print(format_results(tuning))
+    if not args.dry_run:
+        save_tuning(tuning)
+        print(f"Saved to {TUNING_PATH}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
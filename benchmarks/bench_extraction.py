@@ -0,0 +1,202 @@
+"""End-to-end throughput benchmark on synthetic videos.
+
+Generates MP4s locally with cv2.VideoWriter (several resolutions,
+durations, GOP lengths and split-screen aspect ratios), then times every
+stage of poster extraction - open, seek, decode, crop, resize, color
+convert, encode, write - for each seek mode, and the stages of a full
+theme build (theme_builder.build_theme, the ThemeJSONGenerator flow).
+
+Results are written as JSON so runs can be compared across releases:
+
+    python benchmarks/bench_extraction.py --output results.json
+    python benchmarks/bench_extraction.py --full --repeat 5 --output results.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import cv2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import poster_extractor  # noqa: E402
+import theme_builder  # noqa: E402
+from poster_encoders import get_encoder  # noqa: E402
+
+from synthetic import make_theme_folder, make_video, write_theme_xmps  # noqa: E402
+
+# (name, width, height, seconds, gop)
+QUICK_CASES = [
+    ('360p-2s-gop12', 640, 360, 2, 12),
+    ('1080p-4s-gop12', 1920, 1080, 4, 12),
+    ('1080p-4s-gop120', 1920, 1080, 4, 120),
+    ('split-1080p-4s-gop12', 3840, 1080, 4, 12),
+    ('4K-2s-gop30', 3840, 2160, 2, 30),
+]
+FULL_CASES = QUICK_CASES + [
+    ('1080p-4s-gop1', 1920, 1080, 4, 1),
+    ('1080p-20s-gop250', 1920, 1080, 20, 250),
+    ('split-720p-4s-gop12', 2560, 720, 4, 12),
+    ('split-4K-2s-gop30', 7680, 2160, 2, 30),
+]
+
+STAGES = ['open', 'seek', 'decode', 'crop', 'resize', 'color', 'encode', 'write']
+
+
+def time_extract_stages(video_path, position_percent, output_size, encoder, quality, seek_mode):
+    """Run one extraction stage by stage, returning {stage: ms}"""
+    timings = {}
+
+    def lap(stage, start):
+        now = time.perf_counter()
+        timings[stage] = (now - start) * 1000
+        return now
+
+    start = time.perf_counter()
+    probe = poster_extractor.VideoProbe(video_path, seek_mode)
+    start = lap('open', start)
+    try:
+        if not probe.is_valid:
+            raise RuntimeError(probe.error or "Invalid video properties")
+        probe.seek(poster_extractor.frame_index(position_percent, probe.frame_count))
+        start = lap('seek', start)
+        frame = probe.decode()
+        if frame is None:
+            raise RuntimeError("Could not read frame")
+        start = lap('decode', start)
+    finally:
+        probe.close()
+
+    view = poster_extractor.crop_view(frame)
+    start = lap('crop', start)
+    poster = poster_extractor.downscale(view, output_size)
+    start = lap('resize', start)
+    prepared = encoder.prepare(poster)
+    start = lap('color', start)
+    data = encoder.encode(prepared, quality)
+    start = lap('encode', start)
+    with open(poster_extractor.poster_path_for(video_path, extension=encoder.extension), 'wb') as f:
+        f.write(data)
+    lap('write', start)
+
+    timings['total'] = sum(timings[stage] for stage in STAGES)
+    return timings
+
+
+def median_timings(runs):
+    return {stage: round(statistics.median(run[stage] for run in runs), 3) for stage in runs[0]}
+
+
+def bench_extraction(workdir, cases, args):
+    encoder = get_encoder(args.format)
+    seek_modes = [poster_extractor.SEEK_EXACT]
+    if poster_extractor.resolve_seek_mode(poster_extractor.SEEK_KEYFRAME) == poster_extractor.SEEK_KEYFRAME:
+        seek_modes.append(poster_extractor.SEEK_KEYFRAME)
+
+    results = []
+    for name, width, height, seconds, gop in cases:
+        video_path = workdir / f"{name}.mp4"
+        print(f"Generating {name} ({width}x{height}, {seconds}s, GOP {gop})...", file=sys.stderr)
+        video = make_video(video_path, width, height, seconds, gop=gop)
+
+        for seek_mode in seek_modes:
+            runs = [time_extract_stages(str(video_path), args.position, args.size, encoder,
+                                        args.quality, seek_mode)
+                    for _ in range(args.repeat)]
+            stages_ms = median_timings(runs)
+            results.append({'case': name, 'video': video, 'seek_mode': seek_mode,
+                            'stages_ms': stages_ms})
+            print(f"  {seek_mode:<9} total {stages_ms['total']:8.1f} ms  " +
+                  "  ".join(f"{stage} {stages_ms[stage]:.1f}" for stage in STAGES), file=sys.stderr)
+    return results
+
+
+def bench_theme(workdir, args):
+    folder = workdir / 'theme'
+    print(f"Generating theme folder with {args.clips} clips...", file=sys.stderr)
+    videos = make_theme_folder(folder, clip_count=args.clips)
+
+    runs = []
+    for _ in range(args.repeat):
+        # Each build moves the sidecars to xmp_trash/ and writes the JSON, so reset first
+        shutil.rmtree(folder / 'xmp_trash', ignore_errors=True)
+        for json_file in folder.glob('*.json'):
+            json_file.unlink()
+        write_theme_xmps(videos)
+
+        timings = {}
+        start = time.perf_counter()
+        result = theme_builder.build_theme(videos, './assets/media/', args.position, args.quality,
+                                           args.size, encoder=args.format, timings=timings)
+        total = time.perf_counter() - start
+        if result['errors'] or not result['json_path']:
+            raise RuntimeError(f"Theme build failed: {result['errors']}")
+
+        run = {stage: seconds * 1000 for stage, seconds in timings.items()}
+        run['total'] = total * 1000
+        runs.append(run)
+
+    stages_ms = median_timings(runs)
+    print(f"  theme build: total {stages_ms['total']:.1f} ms for {len(videos)} videos  " +
+          "  ".join(f"{stage} {ms:.1f}" for stage, ms in stages_ms.items() if stage != 'total'),
+          file=sys.stderr)
+    return {'videos': len(videos), 'stages_ms': stages_ms,
+            'per_video_ms': round(stages_ms['total'] / len(videos), 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark poster extraction and theme builds.")
+    parser.add_argument('--output', '-o', help="write results JSON here (default: stdout)")
+    parser.add_argument('--full', action='store_true', help="run the larger case matrix")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per case; medians are reported")
+    parser.add_argument('--clips', type=int, default=12, help="clips in the synthetic theme (default: 12)")
+    parser.add_argument('--position', type=float, default=25.0)
+    parser.add_argument('--quality', type=int, default=85)
+    parser.add_argument('--size', type=poster_extractor.parse_size, default=(640, 360))
+    parser.add_argument('--format', default='jpeg', help="poster encoder (default: jpeg)")
+    parser.add_argument('--workdir', help="keep generated media here instead of a temp folder")
+    args = parser.parse_args(argv)
+
+    if args.workdir:
+        workdir = Path(args.workdir)
+        workdir.mkdir(parents=True, exist_ok=True)
+        cleanup = None
+    else:
+        cleanup = tempfile.TemporaryDirectory(prefix='poster-bench-')
+        workdir = Path(cleanup.name)
+
+    try:
+        report = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'opencv': cv2.__version__,
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'settings': {'position': args.position, 'quality': args.quality,
+                             'size': list(args.size), 'format': args.format, 'repeat': args.repeat},
+            },
+            'extract': bench_extraction(workdir, FULL_CASES if args.full else QUICK_CASES, args),
+            'theme': bench_theme(workdir, args),
+        }
+    finally:
+        if cleanup:
+            cleanup.cleanup()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
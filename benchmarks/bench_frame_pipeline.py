@@ -0,0 +1,108 @@
+"""Benchmark the poster frame pipeline against the previous implementation.
+
+The previous pipeline converted the full decoded frame to RGB, sliced the
+split-screen half, copied it into a PIL image and resized that with
+Lanczos. The current one (poster_extractor.render_frame) crops a view,
+area-downscales straight from it, and the encoder converts color last.
+
+For 1080p, 4K and split-screen frames this reports the median time per
+frame (render + JPEG encode) and the peak memory traced by tracemalloc,
+which covers NumPy/OpenCV buffers; memory held inside PIL images is not
+traced, so the legacy peak is an underestimate.
+
+    python benchmarks/bench_frame_pipeline.py --repeat 20
+"""
+import argparse
+import io
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import poster_extractor  # noqa: E402
+from poster_encoders import encode_poster, get_encoder  # noqa: E402
+
+CASES = [
+    ('1080p', 1920, 1080),
+    ('4K', 3840, 2160),
+    ('split-screen 1080p', 3840, 1080),
+    ('split-screen 4K', 7680, 2160),
+]
+OUTPUT_SIZES = [(640, 360), None]
+
+
+def legacy_pipeline(frame, output_size):
+    """The extract_poster image steps as they were before the pipeline rework"""
+    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width = frame.shape[:2]
+    if poster_extractor.is_split_screen(width, height):
+        frame = frame[:, :width//2]
+    img = Image.fromarray(frame)
+    if output_size:
+        img = img.resize(output_size, Image.LANCZOS)
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+
+def current_pipeline(frame, output_size):
+    poster = poster_extractor.render_frame(frame, output_size)
+    data, _ = encode_poster(poster, get_encoder('jpeg'), 85)
+    return data
+
+
+def make_frame(width, height):
+    """A synthetic BGR frame with gradients and noise, so encoding does real work"""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[..., 0] = x
+    frame[..., 1] = y
+    frame[..., 2] = rng.integers(0, 64, (height, width), dtype=np.uint8)
+    return frame
+
+
+def measure(pipeline, frame, output_size, repeat):
+    """Return (median ms per frame, peak traced MB)"""
+    pipeline(frame, output_size)  # Warm up
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pipeline(frame, output_size)
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    pipeline(frame, output_size)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return statistics.median(times), peak / (1024 * 1024)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=10, help="timed runs per case (default: 10)")
+    args = parser.parse_args(argv)
+
+    print(f"{'input':<20} {'output':<10} {'legacy ms':>10} {'new ms':>10} {'speedup':>8} "
+          f"{'legacy MB':>10} {'new MB':>10}")
+    for name, width, height in CASES:
+        frame = make_frame(width, height)
+        for output_size in OUTPUT_SIZES:
+            label = f"{output_size[0]}x{output_size[1]}" if output_size else 'original'
+            legacy_ms, legacy_mb = measure(legacy_pipeline, frame, output_size, args.repeat)
+            new_ms, new_mb = measure(current_pipeline, frame, output_size, args.repeat)
+            print(f"{name:<20} {label:<10} {legacy_ms:>10.1f} {new_ms:>10.1f} "
+                  f"{legacy_ms / new_ms:>7.1f}x {legacy_mb:>10.1f} {new_mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
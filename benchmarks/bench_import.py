@@ -0,0 +1,65 @@
+"""Measure how long the core modules take to import.
+
+Each case is imported in a fresh interpreter under `python -X importtime`,
+and the cumulative import time of everything it pulls in (interpreter
+startup excluded) is reported, along with which heavy libraries got
+loaded. The "eager" cases import cv2, numpy, PIL and PyAV up front, as
+the modules did before those imports were deferred:
+
+    python benchmarks/bench_import.py --repeat 7
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+
+HEAVY = ('cv2', 'numpy', 'PIL.Image', 'av', 'tkinter')
+EAGER = 'import cv2, numpy, PIL.Image\ntry:\n    import av\nexcept ImportError:\n    pass\n'
+
+CASES = [
+    ('marker_grammar', 'import marker_grammar'),
+    ('theme_builder', 'import theme_builder'),
+    ('poster_extractor', 'import poster_extractor'),
+    ('theme_builder, eager', EAGER + 'import theme_builder'),
+    ('poster_extractor, eager', EAGER + 'import poster_extractor'),
+]
+
+
+def import_times(code):
+    """Return ({top-level module: cumulative microseconds}, loaded heavy modules) for running code"""
+    check = f"\nimport sys\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code + check],
+                            cwd=REPO, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented under the module that imported them
+        if not name.startswith('  '):
+            times[name.strip()] = int(cumulative)
+    loaded = [name for name in result.stdout.strip().split(',') if name]
+    return times, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="fresh interpreters per case (default: 5)")
+    args = parser.parse_args(argv)
+
+    startup = set(import_times('pass')[0])
+
+    print(f"{'case':<26} {'import ms':>10} {'heavy modules loaded'}")
+    for label, code in CASES:
+        runs = []
+        for _ in range(args.repeat):
+            times, loaded = import_times(code)
+            runs.append(sum(us for name, us in times.items() if name not in startup) / 1000)
+        print(f"{label:<26} {statistics.median(runs):>10.1f} {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
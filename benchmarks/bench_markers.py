@@ -0,0 +1,201 @@
+"""Microbenchmark the marker grammar against the previous if/elif parser.
+
+Generates a million marker lines (every directive, plus blank and
+free-text lines) grouped into marker blocks, and times:
+
+- legacy:    the old parse_simplified_marker, one startswith per prefix
+- table:     the compiled directive table alone, without the cache
+- compiled:  marker_grammar.parse_marker with the cache cleared first
+             (every block distinct, so this includes cache misses and
+             copying the result)
+- cached:    marker_grammar again, where only --unique distinct blocks
+             exist and repeats are served from the cache
+
+    python benchmarks/bench_markers.py --lines 1000000 --unique 500
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import marker_grammar  # noqa: E402
+
+LINE_TEMPLATES = [
+    "DESCRIPTION: Add headline and supporting text {n}",
+    "THEME-NAME: Theme {n}",
+    "THEME-DESCRIPTION: Generated theme {n}",
+    "TEXT: Headline | headline{n} | 60 | e.g., Welcome",
+    "TEXTAREA: Body | body{n} | 240",
+    "URL: Link | link{n} | https://example.com",
+    "TEXTLIST-FIXED: Steps | steps{n} | 3 | 40 | Enter a step",
+    "TEXTLIST-FLEX: Benefits | benefits{n} | 2-8 | 60 | Enter a benefit",
+    "MEDIA-FIXED: Icons | icons{n} | image | 3 | 3 icons for features",
+    "MEDIA-FLEX: Shots | shots{n} | video | 1-4 | Product shots",
+    "NO-INPUT:",
+    "OVERLAY: true",
+    "TIER: Pro",
+    "",
+    "Free text that is not a directive {n}",
+]
+
+
+def legacy_parse_simplified_marker(marker_text):
+    """parse_simplified_marker as it was before the directive table"""
+    if not marker_text:
+        return None
+
+    config = {
+        'customInputs': []
+    }
+
+    lines = re.split(r'[\r\n]+', marker_text.strip())
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith('DESCRIPTION:'):
+            config['popupMessage'] = line[12:].strip()
+
+        elif line.startswith('THEME-NAME:'):
+            config['themeName'] = line[11:].strip()
+
+        elif line.startswith('THEME-DESCRIPTION:'):
+            config['themeDescription'] = line[18:].strip()
+
+        elif line.startswith('TEXT:'):
+            parts = [p.strip() for p in line[5:].split('|')]
+            if len(parts) >= 3:
+                input_def = {'inputType': 'text', 'label': parts[0], 'fieldId': parts[1],
+                             'maxLength': int(parts[2])}
+                if len(parts) > 3 and parts[3]:
+                    input_def['placeholder'] = parts[3]
+                config['customInputs'].append(input_def)
+
+        elif line.startswith('TEXTAREA:'):
+            parts = [p.strip() for p in line[9:].split('|')]
+            if len(parts) >= 3:
+                input_def = {'inputType': 'textarea', 'label': parts[0], 'fieldId': parts[1],
+                             'maxLength': int(parts[2])}
+                if len(parts) > 3 and parts[3]:
+                    input_def['placeholder'] = parts[3]
+                config['customInputs'].append(input_def)
+
+        elif line.startswith('URL:'):
+            parts = [p.strip() for p in line[4:].split('|')]
+            if len(parts) >= 2:
+                input_def = {'inputType': 'url', 'label': parts[0], 'fieldId': parts[1]}
+                if len(parts) > 2 and parts[2]:
+                    input_def['placeholder'] = parts[2]
+                config['customInputs'].append(input_def)
+
+        elif line.startswith('TEXTLIST-FIXED:'):
+            parts = [p.strip() for p in line[15:].split('|')]
+            if len(parts) >= 4:
+                input_def = {'inputType': 'textList', 'label': parts[0], 'fieldId': parts[1],
+                             'count': int(parts[2]), 'itemMaxLength': int(parts[3])}
+                if len(parts) > 4 and parts[4]:
+                    input_def['placeholder'] = parts[4]
+                config['customInputs'].append(input_def)
+
+        elif line.startswith('TEXTLIST-FLEX:'):
+            parts = [p.strip() for p in line[14:].split('|')]
+            if len(parts) >= 4:
+                min_max = parts[2].split('-')
+                input_def = {'inputType': 'textList', 'label': parts[0], 'fieldId': parts[1],
+                             'minItems': int(min_max[0]), 'maxItems': int(min_max[1]),
+                             'itemMaxLength': int(parts[3])}
+                if len(parts) > 4 and parts[4]:
+                    input_def['placeholder'] = parts[4]
+                config['customInputs'].append(input_def)
+
+        elif line.startswith('MEDIA-FIXED:'):
+            parts = [p.strip() for p in line[12:].split('|')]
+            if len(parts) >= 5:
+                config['customInputs'].append({
+                    'inputType': 'mediaRequestList', 'label': parts[0], 'fieldId': parts[1],
+                    'mediaType': parts[2], 'count': int(parts[3]), 'description': parts[4]})
+
+        elif line.startswith('MEDIA-FLEX:'):
+            parts = [p.strip() for p in line[11:].split('|')]
+            if len(parts) >= 5:
+                min_max = parts[3].split('-')
+                config['customInputs'].append({
+                    'inputType': 'mediaRequestList', 'label': parts[0], 'fieldId': parts[1],
+                    'mediaType': parts[2], 'minItems': int(min_max[0]), 'maxItems': int(min_max[1]),
+                    'description': parts[4]})
+
+        elif line.startswith('NO-INPUT:'):
+            config['requiresInput'] = False
+
+        elif line.startswith('OVERLAY:'):
+            config['isOverlay'] = True
+
+        elif line.startswith('TIER:'):
+            config['tierRequirement'] = line[5:].strip()
+
+    return config
+
+
+def make_blocks(line_count, block_lines, unique):
+    """Build marker blocks totalling line_count lines, drawn from `unique` distinct blocks"""
+    rng = random.Random(0)
+    distinct = []
+    for n in range(unique):
+        lines = [rng.choice(LINE_TEMPLATES).format(n=n) for _ in range(block_lines)]
+        distinct.append('\n'.join(lines))
+    count = line_count // block_lines
+    if unique >= count:
+        return distinct[:count]
+    return [distinct[rng.randrange(unique)] for _ in range(count)]
+
+
+def run(parse, blocks):
+    start = time.perf_counter()
+    for block in blocks:
+        parse(block)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1000000, help="marker lines to parse (default: 1M)")
+    parser.add_argument('--block-lines', type=int, default=10, help="lines per marker block (default: 10)")
+    parser.add_argument('--unique', type=int, default=500,
+                        help="distinct marker blocks in the cached run (default: 500)")
+    args = parser.parse_args(argv)
+
+    unique_blocks = make_blocks(args.lines, args.block_lines, args.lines // args.block_lines)
+    shared_blocks = make_blocks(args.lines, args.block_lines, args.unique)
+    total_lines = len(unique_blocks) * args.block_lines
+
+    # Same output as before for well-formed markers
+    for block in unique_blocks[:1000]:
+        if marker_grammar.parse_marker(block)[0] != legacy_parse_simplified_marker(block):
+            raise RuntimeError(f"Parsers disagree on:\n{block}")
+
+    legacy = run(legacy_parse_simplified_marker, unique_blocks)
+    table = run(marker_grammar._parse_cached.__wrapped__, unique_blocks)
+    marker_grammar._parse_cached.cache_clear()
+    compiled = run(marker_grammar.parse_marker, unique_blocks)
+    marker_grammar._parse_cached.cache_clear()
+    cached = run(marker_grammar.parse_marker, shared_blocks)
+    hits = marker_grammar._parse_cached.cache_info().hits
+
+    print(f"{total_lines} lines in {len(unique_blocks)} blocks")
+    print(f"{'parser':<30} {'seconds':>8} {'lines/s':>12} {'speedup':>8}")
+    print(f"{'legacy if/elif':<30} {legacy:>8.2f} {total_lines / legacy:>12,.0f} {1:>7.1f}x")
+    print(f"{'table only, no cache':<30} {table:>8.2f} {total_lines / table:>12,.0f} "
+          f"{legacy / table:>7.1f}x")
+    print(f"{'compiled, all distinct':<30} {compiled:>8.2f} {total_lines / compiled:>12,.0f} "
+          f"{legacy / compiled:>7.1f}x")
+    print(f"{f'compiled, {args.unique} distinct':<30} {cached:>8.2f} {total_lines / cached:>12,.0f} "
+          f"{legacy / cached:>7.1f}x  ({hits} cache hits)")
+
+
+if __name__ == "__main__":
+    main()
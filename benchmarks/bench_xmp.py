@@ -0,0 +1,120 @@
+"""Benchmark streaming XMP marker parsing against the previous implementation.
+
+The previous parser loaded the whole sidecar with ET.parse and ran two
+findall passes; theme_builder.parse_xmp_metadata now streams it with
+iterparse, stops at the title and first qualifying marker and detaches
+finished elements.
+
+Synthetic sidecars with growing xmpMM:History sections are generated with
+the history either before the markers (the whole file must still be read)
+or after them (the parser can stop early). Reports the median time per
+parse and the peak memory traced by tracemalloc.
+
+    python benchmarks/bench_xmp.py --repeat 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import theme_builder  # noqa: E402
+
+from synthetic import CLIP_MARKER, THEME_MARKER, make_xmp  # noqa: E402
+
+HISTORY_SIZES = [0, 1000, 10000, 50000]
+
+
+def legacy_parse_xmp_metadata(xmp_path, look_for_theme=False):
+    """parse_xmp_metadata as it was before the streaming parser"""
+    try:
+        tree = ET.parse(xmp_path)
+        root = tree.getroot()
+
+        namespaces = {
+            'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+            'xmpDM': 'http://ns.adobe.com/xmp/1.0/DynamicMedia/',
+            'dc': 'http://purl.org/dc/elements/1.1/'
+        }
+
+        comp_title = None
+        for title_elem in root.findall('.//dc:title/rdf:Alt/rdf:li', namespaces):
+            comp_title = title_elem.text
+            break
+
+        marker_comment = None
+        for marker in root.findall('.//xmpDM:markers/rdf:Seq/rdf:li', namespaces):
+            start_time_elem = marker.find('xmpDM:startTime', namespaces)
+            comment_elem = marker.find('xmpDM:comment', namespaces)
+
+            if start_time_elem is not None and comment_elem is not None:
+                start_time = int(start_time_elem.text)
+
+                if look_for_theme and start_time == 0:
+                    marker_comment = comment_elem.text
+                    break
+                elif not look_for_theme and start_time > 0:
+                    marker_comment = comment_elem.text
+                    break
+
+        return comp_title, marker_comment
+
+    except Exception as e:
+        print(f"Error parsing XMP: {e}")
+        return None, None
+
+
+def measure(parser, xmp_path, repeat):
+    """Return (median ms per parse, peak traced MB, result)"""
+    result = parser(xmp_path)  # Warm up (and page cache)
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(xmp_path)
+        times.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    parser(xmp_path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return statistics.median(times), peak / (1024 * 1024), result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case (default: 5)")
+    args = parser.parse_args(argv)
+
+    markers = [(0, THEME_MARKER), (1, CLIP_MARKER)]
+    print(f"{'history':>8} {'layout':<15} {'size MB':>8} {'legacy ms':>10} {'new ms':>10} {'speedup':>8} "
+          f"{'legacy MB':>10} {'new MB':>10}")
+
+    with tempfile.TemporaryDirectory(prefix='xmp-bench-') as workdir:
+        for history_entries in HISTORY_SIZES:
+            for history_first in (True, False):
+                xmp_path = os.path.join(workdir, 'clip.xmp')
+                make_xmp(xmp_path, 'hook-001-Clip1', markers, history_entries, history_first)
+                size_mb = os.path.getsize(xmp_path) / (1024 * 1024)
+
+                with contextlib.redirect_stdout(io.StringIO()):
+                    legacy_ms, legacy_mb, expected = measure(legacy_parse_xmp_metadata, xmp_path, args.repeat)
+                    new_ms, new_mb, result = measure(theme_builder.parse_xmp_metadata, xmp_path, args.repeat)
+                if result != expected:
+                    raise RuntimeError(f"Parsers disagree: {result!r} != {expected!r}")
+
+                layout = 'history first' if history_first else 'markers first'
+                print(f"{history_entries:>8} {layout:<15} {size_mb:>8.2f} {legacy_ms:>10.2f} {new_ms:>10.2f} "
+                      f"{legacy_ms / new_ms:>7.1f}x {legacy_mb:>10.2f} {new_mb:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
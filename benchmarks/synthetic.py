@@ -0,0 +1,175 @@
+"""Synthetic test media for the benchmarks.
+
+make_video writes an MP4 with cv2.VideoWriter; make_xmp writes an After
+Effects style XMP sidecar with a title and markers; make_theme_folder
+puts together a theme-demo clip and a set of category clips ready for
+theme_builder.build_theme.
+"""
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+import cv2
+import numpy as np
+
+try:
+    import av  # Only used to check how many keyframes the writer produced
+except ImportError:
+    av = None
+
+XMP_TEMPLATE = """<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/" x:xmptk="Adobe XMP Core 9.1">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:xmpDM="http://ns.adobe.com/xmp/1.0/DynamicMedia/"
+    xmlns:xmpMM="http://ns.adobe.com/xap/1.0/mm/"
+    xmlns:stEvt="http://ns.adobe.com/xap/1.0/sType/ResourceEvent#">
+{history_before}
+   <dc:title>
+    <rdf:Alt>
+     <rdf:li xml:lang="x-default">{title}</rdf:li>
+    </rdf:Alt>
+   </dc:title>
+   <xmpDM:Tracks>
+    <rdf:Bag>
+     <rdf:li rdf:parseType="Resource">
+      <xmpDM:trackName>Comp Markers</xmpDM:trackName>
+      <xmpDM:markers>
+       <rdf:Seq>
+{markers}
+       </rdf:Seq>
+      </xmpDM:markers>
+     </rdf:li>
+    </rdf:Bag>
+   </xmpDM:Tracks>
+{history_after}
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>
+"""
+
+HISTORY_BLOCK = """   <xmpMM:History>
+    <rdf:Seq>
+{entries}
+    </rdf:Seq>
+   </xmpMM:History>"""
+
+HISTORY_ENTRY = """     <rdf:li rdf:parseType="Resource">
+      <stEvt:action>saved</stEvt:action>
+      <stEvt:instanceID>xmp.iid:{index:08x}-0000-0000-0000-000000000000</stEvt:instanceID>
+      <stEvt:when>2024-01-01T00:00:00Z</stEvt:when>
+      <stEvt:softwareAgent>Adobe After Effects 2024</stEvt:softwareAgent>
+      <stEvt:changed>/metadata</stEvt:changed>
+     </rdf:li>"""
+
+MARKER_ENTRY = """        <rdf:li rdf:parseType="Resource">
+         <xmpDM:startTime>{start}</xmpDM:startTime>
+         <xmpDM:comment>{comment}</xmpDM:comment>
+        </rdf:li>"""
+
+CLIP_MARKER = """DESCRIPTION: Add headline and supporting text.
+TEXT: Headline | headline | 60 | e.g., Welcome
+TEXT: Subheadline | subheadline | 80 | e.g., Discover the Future
+TEXTLIST-FLEX: Benefits | benefits | 2-8 | 60 | Enter a benefit
+MEDIA-FIXED: Feature Icons | featureIcons | image | 3 | 3 icons for features
+TIER: Pro"""
+
+THEME_MARKER = """THEME-NAME: Synthetic Benchmark Theme
+THEME-DESCRIPTION: Generated clips for benchmarking"""
+
+CATEGORIES = ['hook', 'solution-intro', 'features-benefits', 'product-showcase', 'proof-trust', 'cta']
+
+
+def make_video(path, width, height, seconds, fps=30, gop=12):
+    """Write a synthetic MP4 with moving texture, returning its properties
+
+    The GOP length is requested through VIDEOWRITER_PROP_KEY_INTERVAL;
+    not every OpenCV/FFmpeg build honors it, so the keyframe count that
+    was actually written is reported when PyAV is available.
+    """
+    rng = np.random.default_rng(width * height + seconds)
+    texture = rng.integers(0, 255, (height, width + 2 * fps, 3), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (5, 5), 0)
+    ramp = np.linspace(0, 1, width, dtype=np.float32)[None, :, None]
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height),
+                             [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, gop])
+    if not writer.isOpened():
+        raise RuntimeError(f"Could not open video writer for {path}")
+
+    frame_count = int(seconds * fps)
+    for i in range(frame_count):
+        offset = i % (2 * fps)
+        frame = texture[:, offset:offset + width].astype(np.float32)
+        # Fade so frames differ in brightness as well as position
+        frame *= 0.5 + 0.5 * ((i / max(1, frame_count - 1) + ramp) % 1.0)
+        writer.write(frame.astype(np.uint8))
+    writer.release()
+
+    return {
+        'width': width,
+        'height': height,
+        'seconds': seconds,
+        'fps': fps,
+        'gop': gop,
+        'keyframes': count_keyframes(path),
+    }
+
+
+def count_keyframes(path):
+    """Number of keyframes in a video, or None without PyAV"""
+    if av is None:
+        return None
+    with av.open(str(path)) as container:
+        stream = container.streams.video[0]
+        return sum(1 for packet in container.demux(stream) if packet.is_keyframe)
+
+
+def make_xmp(path, title, markers, history_entries=0, history_first=True):
+    """Write an XMP sidecar with a title and (start_frame, comment) markers
+
+    history_entries adds that many xmpMM:History events, before the title
+    and markers or, with history_first=False, after them.
+    """
+    history = HISTORY_BLOCK.format(entries='\n'.join(HISTORY_ENTRY.format(index=i)
+                                                    for i in range(history_entries)))
+    marker_xml = '\n'.join(MARKER_ENTRY.format(start=start, comment=escape(comment))
+                           for start, comment in markers)
+    Path(path).write_text(XMP_TEMPLATE.format(title=escape(title), markers=marker_xml,
+                                              history_before=history if history_first else '',
+                                              history_after='' if history_first else history),
+                          encoding='utf-8')
+
+
+def make_theme_folder(folder, clip_count=12, width=640, height=360, seconds=2):
+    """Create theme-demo.mp4 plus clip_count category clips, each with an XMP sidecar
+
+    Every third clip is rendered split-screen (double width). Returns the
+    video paths in queue order.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+
+    videos = [folder / 'theme-demo.mp4']
+    make_video(videos[0], width, height, seconds)
+    for i in range(clip_count):
+        category = CATEGORIES[i % len(CATEGORIES)]
+        video_path = folder / f"{category}-{i + 1:03d}-Clip{i + 1}.mp4"
+        clip_width = width * 2 if i % 3 == 2 else width
+        make_video(video_path, clip_width, height, seconds)
+        videos.append(video_path)
+
+    write_theme_xmps(videos)
+    return [str(video_path) for video_path in videos]
+
+
+def write_theme_xmps(videos, history_entries=0):
+    """(Re)write the XMP sidecars for a theme folder made by make_theme_folder"""
+    for video_path in videos:
+        video_path = Path(video_path)
+        if 'theme' in video_path.stem:
+            markers = [(0, THEME_MARKER)]
+        else:
+            markers = [(1, CLIP_MARKER)]
+        make_xmp(video_path.with_suffix('.xmp'), video_path.stem, markers, history_entries)
@@ -0,0 +1,66 @@
+"""Vectorized frame scoring for automatic poster selection.
+
+Candidate frames are downscaled to small grayscale thumbnails and stacked
+into one array, so every metric is computed for the whole batch with a
+handful of NumPy operations:
+
+- sharpness: variance of the Laplacian (blurred frames score low)
+- luminance: mean brightness (rejects black and white-flash frames)
+- contrast: standard deviation (rejects flat frames, e.g. solid fades)
+"""
+from lazy_imports import lazy_import
+
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+
+# Width of the grayscale thumbnails the metrics are computed on
+SCORE_WIDTH = 160
+
+# Rejection thresholds on the 0-255 scale
+MIN_LUMINANCE = 16.0
+MAX_LUMINANCE = 240.0
+MIN_CONTRAST = 8.0
+
+
+def downscale_gray(frame, width=SCORE_WIDTH):
+    """Area-downscale a BGR frame to a small grayscale thumbnail"""
+    height, frame_width = frame.shape[:2]
+    if frame_width > width:
+        size = (width, max(1, round(height * width / frame_width)))
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+
+def frame_metrics(thumbnails):
+    """Compute (sharpness, luminance, contrast) arrays for a stack of thumbnails
+
+    thumbnails is an (N, H, W) array of grayscale frames.
+    """
+    batch = thumbnails.astype(np.float32)
+
+    # 4-neighbour Laplacian over the whole batch at once
+    center = batch[:, 1:-1, 1:-1]
+    laplacian = (batch[:, :-2, 1:-1] + batch[:, 2:, 1:-1] +
+                 batch[:, 1:-1, :-2] + batch[:, 1:-1, 2:] - 4 * center)
+
+    sharpness = laplacian.reshape(len(batch), -1).var(axis=1)
+    flat = batch.reshape(len(batch), -1)
+    return sharpness, flat.mean(axis=1), flat.std(axis=1)
+
+
+def score_frames(frames):
+    """Score BGR frames for use as a poster and return (best_index, scores)
+
+    Black, white-flash and flat frames are rejected outright; the rest are
+    ranked by sharpness. If every frame is rejected, the one with the most
+    contrast wins.
+    """
+    thumbnails = np.stack([downscale_gray(frame) for frame in frames])
+    sharpness, luminance, contrast = frame_metrics(thumbnails)
+
+    rejected = (luminance < MIN_LUMINANCE) | (luminance > MAX_LUMINANCE) | (contrast < MIN_CONTRAST)
+    scores = np.where(rejected, -1.0, sharpness)
+
+    if rejected.all():
+        return int(np.argmax(contrast)), scores
+    return int(np.argmax(scores)), scores
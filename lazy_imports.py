@@ -0,0 +1,78 @@
+"""Deferred imports for the heavy libraries (OpenCV, NumPy, Pillow, PyAV).
+
+Importing cv2, numpy and PIL takes a large part of a second, which every
+script paid just to parse a marker or assemble a theme JSON. The core
+modules bind those names to LazyModule placeholders instead; the real
+module is imported the first time one of its attributes is used.
+"""
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is first used
+
+    on_load, if given, is called with the real module right after it is
+    imported (e.g. to register plugins).
+    """
+
+    def __init__(self, name, on_load=None):
+        self.__name = name
+        self.__on_load = on_load
+        self.__module = None
+        self.__error = None
+
+    def __load(self):
+        if self.__module is None:
+            module = importlib.import_module(self.__name)
+            if self.__on_load is not None:
+                self.__on_load(module)
+            self.__module = module
+        return self.__module
+
+    def _try_load(self):
+        """Import the module if possible; False if its import fails (the error is remembered)"""
+        if self.__module is None and self.__error is None:
+            try:
+                self.__load()
+            except ImportError as e:
+                self.__error = e
+        return self.__module is not None
+
+    def __getattr__(self, attr):
+        value = getattr(self.__load(), attr)
+        # Keep it on the placeholder so later lookups skip __getattr__
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        state = 'loaded' if self.__module is not None else 'not loaded'
+        return f"<lazy module '{self.__name}' ({state})>"
+
+
+def lazy_import(name, optional=False, on_load=None):
+    """A LazyModule for name, or None if optional and the module is not installed
+
+    Whether an optional module exists is checked without importing it, so
+    code using one should test it with is_available() rather than `is None`.
+    """
+    if optional:
+        try:
+            if importlib.util.find_spec(name) is None:
+                return None
+        except (ImportError, ValueError):
+            return None
+    return LazyModule(name, on_load)
+
+
+def is_available(module):
+    """True if module (None, a LazyModule or a real module) can be used
+
+    A LazyModule is imported here; one whose import fails, such as a
+    broken PyAV install, counts as unavailable.
+    """
+    if module is None:
+        return False
+    if isinstance(module, LazyModule):
+        return module._try_load()
+    return True
@@ -0,0 +1,162 @@
+"""Simplified marker syntax used in After Effects comp markers.
+
+Each non-blank marker line is a directive, `KEYWORD: value` or
+`KEYWORD: field | field | ...`. The directives are declared once in
+DIRECTIVES and compiled into a keyword -> handler dict, so each line
+costs one split and one dict lookup however many directives there are.
+
+Malformed lines (too few fields, bad numbers) are skipped and reported
+as MarkerError entries with their line number instead of aborting the
+whole marker. Lines that are not directives are ignored. Results are
+memoized by marker text, since many clips share identical blocks.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Number of distinct marker texts whose parse results are kept
+CACHE_SIZE = 4096
+
+LINE_BREAK = re.compile(r'\r\n|\r|\n')
+
+
+class MarkerError(namedtuple('MarkerError', 'line directive message')):
+    """A marker line that could not be parsed (line numbers start at 1)"""
+
+    def __str__(self):
+        return f"line {self.line}: {self.directive}: {self.message}"
+
+
+# Field kinds in the directive table
+TEXT = 'text'
+INT = 'int'
+RANGE = 'range'  # MIN-MAX, stored under two keys
+
+
+# keyword -> ('setting', config key, constant or None to use the line's value)
+#          | ('input', inputType, required (key, kind) fields, optional trailing key)
+DIRECTIVES = {
+    'DESCRIPTION': ('setting', 'popupMessage', None),
+    'THEME-NAME': ('setting', 'themeName', None),
+    'THEME-DESCRIPTION': ('setting', 'themeDescription', None),
+    'TEXT': ('input', 'text',
+             [('label', TEXT), ('fieldId', TEXT), ('maxLength', INT)], 'placeholder'),
+    'TEXTAREA': ('input', 'textarea',
+                 [('label', TEXT), ('fieldId', TEXT), ('maxLength', INT)], 'placeholder'),
+    'URL': ('input', 'url',
+            [('label', TEXT), ('fieldId', TEXT)], 'placeholder'),
+    'TEXTLIST-FIXED': ('input', 'textList',
+                       [('label', TEXT), ('fieldId', TEXT), ('count', INT), ('itemMaxLength', INT)],
+                       'placeholder'),
+    'TEXTLIST-FLEX': ('input', 'textList',
+                      [('label', TEXT), ('fieldId', TEXT), (('minItems', 'maxItems'), RANGE),
+                       ('itemMaxLength', INT)], 'placeholder'),
+    'MEDIA-FIXED': ('input', 'mediaRequestList',
+                    [('label', TEXT), ('fieldId', TEXT), ('mediaType', TEXT), ('count', INT),
+                     ('description', TEXT)], None),
+    'MEDIA-FLEX': ('input', 'mediaRequestList',
+                   [('label', TEXT), ('fieldId', TEXT), ('mediaType', TEXT),
+                    (('minItems', 'maxItems'), RANGE), ('description', TEXT)], None),
+    'NO-INPUT': ('setting', 'requiresInput', False),
+    'OVERLAY': ('setting', 'isOverlay', True),
+    'TIER': ('setting', 'tierRequirement', None),
+}
+
+
+def compile_setting(key, constant):
+    if constant is None:
+        def handle(config, value):
+            config[key] = value.strip()
+    else:
+        def handle(config, value):
+            config[key] = constant
+    return handle
+
+
+def convert_field(key, kind, value, input_def):
+    """Store one numeric field in input_def, raising ValueError if it is malformed"""
+    if kind == INT:
+        try:
+            input_def[key] = int(value)
+        except ValueError:
+            raise ValueError(f"{key} must be a whole number, got '{value}'")
+    else:
+        bounds = value.split('-')
+        try:
+            input_def[key[0]] = int(bounds[0])
+            input_def[key[1]] = int(bounds[1])
+        except (ValueError, IndexError):
+            raise ValueError(f"{key[0]}-{key[1]} must look like MIN-MAX, got '{value}'")
+
+
+def compile_input(input_type, fields, optional_key):
+    required = len(fields)
+    fields = tuple((i, key, kind) for i, (key, kind) in enumerate(fields))
+
+    def handle(config, value):
+        parts = [p.strip() for p in value.split('|')]
+        if len(parts) < required:
+            raise ValueError(f"expected at least {required} '|'-separated fields, got {len(parts)}")
+        input_def = {'inputType': input_type}
+        for i, key, kind in fields:
+            if kind == TEXT:
+                input_def[key] = parts[i]
+            else:
+                convert_field(key, kind, parts[i], input_def)
+        if optional_key and len(parts) > required and parts[required]:
+            input_def[optional_key] = parts[required]
+        config['customInputs'].append(input_def)
+    return handle
+
+
+def compile_directives(directives):
+    """Turn a directive table into a keyword -> handler(config, value) dict"""
+    dispatch = {}
+    for keyword, (kind, *spec) in directives.items():
+        if kind == 'setting':
+            dispatch[keyword] = compile_setting(*spec)
+        else:
+            dispatch[keyword] = compile_input(*spec)
+    return dispatch
+
+
+DISPATCH = compile_directives(DIRECTIVES)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_cached(marker_text):
+    config = {'customInputs': []}
+    errors = []
+
+    for line_number, line in enumerate(LINE_BREAK.split(marker_text), start=1):
+        line = line.strip()
+        if not line:
+            continue
+
+        keyword, colon, value = line.partition(':')
+        handle = DISPATCH.get(keyword) if colon else None
+        if handle is None:
+            continue
+
+        try:
+            handle(config, value)
+        except ValueError as e:
+            errors.append(MarkerError(line_number, keyword, str(e)))
+
+    return config, tuple(errors)
+
+
+def parse_marker(marker_text):
+    """Parse marker text into (config, errors), or (None, ()) for empty text
+
+    config is a fresh dict the caller may modify; errors is a tuple of
+    MarkerError for the lines that were skipped.
+    """
+    if not marker_text:
+        return None, ()
+
+    config, errors = _parse_cached(marker_text)
+    # The cached result is shared, so hand out a copy
+    config = dict(config)
+    config['customInputs'] = [dict(input_def) for input_def in config['customInputs']]
+    return config, errors
@@ -0,0 +1,217 @@
+"""Memory governor for batches over 4K/8K sources.
+
+A decoded 8K BGR frame is about 100 MB, and the decoder keeps several
+reference surfaces of its own, so a handful of parallel workers on 8K
+masters can exhaust a machine. The extraction engine therefore estimates
+each job's peak frame memory from the video's width and height (read
+from the MP4 header, without opening a decoder) and only starts a job
+when the estimates of the jobs in flight stay within a byte budget;
+large jobs wait until earlier ones finish.
+
+MemoryGovernor holds the budget; one governor can be shared by several
+batches running side by side. PeakRSS collects the peak resident set
+size of the main process and of every worker, so the footprint of a
+batch can be reported.
+"""
+import os
+import struct
+import sys
+import threading
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+# Decoded surfaces (YUV 4:2:0, 1.5 bytes per pixel) a decoder may hold:
+# reference frames plus frame-threading copies
+DECODER_SURFACES = 8
+BGR_BYTES_PER_PIXEL = 3
+YUV420_BYTES_PER_PIXEL = 1.5
+
+# Default budget for parallel runs, as a fraction of physical memory
+DEFAULT_BUDGET_FRACTION = 0.5
+
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_bytes(value):
+    """Parse a size like '8G', '512M' or '1048576' into bytes"""
+    text = str(value).strip().upper().removesuffix('B')
+    unit = text[-1:] if text[-1:] in SIZE_UNITS and not text[-1:].isdigit() else ''
+    number = text[:-1] if unit else text
+    try:
+        size = float(number) * SIZE_UNITS[unit]
+    except ValueError:
+        raise ValueError(f"invalid size '{value}' (expected e.g. 8G, 512M)")
+    if size < 0:
+        raise ValueError(f"invalid size '{value}' (must not be negative)")
+    return int(size)
+
+
+def format_bytes(size):
+    """Human-readable size, e.g. '1.5 GB'"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def physical_memory():
+    """Total physical memory in bytes, or None where it can't be read"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def default_budget():
+    """The frame-memory budget used for parallel runs unless one is given (None if unknown)"""
+    total = physical_memory()
+    return int(total * DEFAULT_BUDGET_FRACTION) if total else None
+
+
+def _boxes(f, end):
+    """Yield (type, payload start, payload end) for the MP4 boxes in f up to end"""
+    position = f.tell()
+    while position + 8 <= end:
+        f.seek(position)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        payload = position + 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            payload += 8
+        elif size == 0:
+            size = end - position
+        if size < payload - position:
+            return
+        yield box_type, payload, position + size
+        position += size
+
+
+def mp4_dimensions(video_path):
+    """(width, height) of the largest track in an MP4's header, or None
+
+    Only the box headers and the track headers (tkhd) are read, so this
+    costs a few small reads even for multi-GB files.
+    """
+    try:
+        with open(video_path, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            f.seek(0)
+            best = None
+            for box_type, start, stop in list(_boxes(f, end)):
+                if box_type != b'moov':
+                    continue
+                f.seek(start)
+                for trak_type, trak_start, trak_stop in list(_boxes(f, stop)):
+                    if trak_type != b'trak':
+                        continue
+                    f.seek(trak_start)
+                    for header_type, header_start, header_stop in list(_boxes(f, trak_stop)):
+                        if header_type != b'tkhd' or header_stop - header_start < 8:
+                            continue
+                        # Width and height (16.16 fixed point) end the tkhd box
+                        f.seek(header_stop - 8)
+                        width, height = struct.unpack('>II', f.read(8))
+                        width, height = width >> 16, height >> 16
+                        if width and height and (best is None or width * height > best[0] * best[1]):
+                            best = (width, height)
+            return best
+    except (OSError, struct.error):
+        return None
+
+
+def estimate_job_bytes(width, height, frames_held=1):
+    """Peak frame memory of one extraction job on a width x height source
+
+    frames_held full-size BGR frames (1, or more for auto mode and extra
+    positions) plus the decoder's own surfaces. The crop is a view and the
+    poster-sized copies are negligible next to these.
+    """
+    pixels = width * height
+    return int(pixels * (BGR_BYTES_PER_PIXEL * frames_held + YUV420_BYTES_PER_PIXEL * DECODER_SURFACES))
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where unsupported"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryGovernor:
+    """Admit jobs while their estimated frame memory fits within budget bytes
+
+    A job is always admitted when nothing else is in flight, so a source
+    larger than the whole budget still runs, on its own.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.in_flight = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def _fits(self, size):
+        return self.in_flight == 0 or self.in_flight + size <= self.budget
+
+    def _take(self, size):
+        self.in_flight += size
+        self.peak = max(self.peak, self.in_flight)
+
+    def try_acquire(self, size):
+        """Reserve size bytes if they fit now; returns whether they were reserved"""
+        with self._condition:
+            if not self._fits(size):
+                return False
+            self._take(size)
+            return True
+
+    def acquire(self, size):
+        """Reserve size bytes, waiting for other jobs to release enough"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._fits(size))
+            self._take(size)
+
+    def release(self, size):
+        with self._condition:
+            self.in_flight -= size
+            self._condition.notify_all()
+
+
+class PeakRSS:
+    """Peak resident memory of a batch: this process and each worker process"""
+
+    def __init__(self):
+        self.main_pid = os.getpid()
+        self.workers = {}
+
+    def record(self, stats):
+        """Note the peak RSS a job reported in its stats ('pid', 'peak_rss')"""
+        pid, peak = stats.get('pid'), stats.get('peak_rss')
+        if pid is None or peak is None or pid == self.main_pid:
+            return
+        self.workers[pid] = max(peak, self.workers.get(pid, 0))
+
+    def format(self, governor=None):
+        """One-line summary for the end of a batch, with the governor's peak if given"""
+        parts = []
+        main = peak_rss()
+        if main is not None:
+            parts.append(f"main process {format_bytes(main)}")
+        if self.workers:
+            parts.append(f"{len(self.workers)} workers {format_bytes(sum(self.workers.values()))} total "
+                         f"(largest {format_bytes(max(self.workers.values()))})")
+        if not parts:
+            return "Peak RSS: not available on this platform"
+        line = "Peak RSS: " + ", ".join(parts)
+        if governor is not None:
+            line += (f"; estimated frame memory in flight peaked at {format_bytes(governor.peak)} "
+                     f"of {format_bytes(governor.budget)} budget")
+        return line
@@ -0,0 +1,151 @@
+"""Incremental poster cache.
+
+Each output folder gets a sidecar manifest (.poster-manifest.json) that
+records, per video, the source file's size and mtime and the settings
+used to make its poster. A poster is up to date when the video is
+unchanged, the settings match and every file it produced (extra-position
+posters and contact sheet included) still exists, so a re-run only
+regenerates stale posters.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+
+MANIFEST_NAME = '.poster-manifest.json'
+MANIFEST_VERSION = 1
+
+
+def poster_settings(position_percent, quality, output_size=None, seek_mode='exact',
+                    extra_positions=None, contact_sheet=False, poster_mode='fixed',
+                    encoder='jpeg', target_kb=None):
+    """Build the settings record stored with each poster"""
+    settings = {
+        'position': float(position_percent),
+        'quality': int(quality),
+        'outputSize': list(output_size) if output_size else None,
+        'seekMode': seek_mode,
+    }
+    # Only recorded when used, so manifests from single-poster runs stay valid
+    if extra_positions:
+        settings['extraPositions'] = [float(position) for position in extra_positions]
+    if contact_sheet:
+        settings['contactSheet'] = True
+    if poster_mode != 'fixed':
+        settings['posterMode'] = poster_mode
+    if encoder != 'jpeg':
+        settings['encoder'] = encoder
+    if target_kb:
+        settings['targetKb'] = float(target_kb)
+    return settings
+
+
+def source_signature(video_path):
+    """Size and mtime of a source video, or None if it cannot be read"""
+    try:
+        stat = os.stat(video_path)
+    except OSError:
+        return None
+    return {'size': stat.st_size, 'mtimeNs': stat.st_mtime_ns}
+
+
+class PosterManifest:
+    """Manifest of the posters generated in one output folder"""
+
+    def __init__(self, folder):
+        self.path = Path(folder) / MANIFEST_NAME
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load the manifest, starting empty if it is missing or unreadable"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.entries = data.get('posters', {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    def is_fresh(self, video_path, settings):
+        """True if the poster for video_path is up to date for these settings"""
+        entry = self.entries.get(Path(video_path).name)
+        if not entry:
+            return False
+        if entry.get('source') != source_signature(video_path):
+            return False
+        if entry.get('settings') != settings:
+            return False
+        outputs = entry.get('outputs') or [entry.get('poster', '')]
+        return all((self.path.parent / name).is_file() for name in outputs)
+
+    def record(self, video_path, settings, poster_path, seek_mode=None, outputs=None):
+        """Remember that poster_path was generated from video_path with settings
+
+        seek_mode, if given, is the seek mode the extraction actually used
+        (e.g. 'exact' when 'keyframe' fell back without PyAV); it is stored
+        in place of the requested one. outputs lists every file written for
+        the video (see poster_extractor.output_paths); it defaults to just
+        poster_path.
+        """
+        signature = source_signature(video_path)
+        if signature is None:
+            return
+        if seek_mode is not None:
+            settings = dict(settings, seekMode=seek_mode)
+        self.entries[Path(video_path).name] = {
+            'source': signature,
+            'settings': settings,
+            'poster': Path(poster_path).name,
+            'outputs': [Path(path).name for path in outputs or [poster_path]],
+        }
+        self.dirty = True
+
+    def save(self):
+        """Write the manifest atomically if anything changed"""
+        if not self.dirty:
+            return
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'posters': self.entries}, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+
+class PosterCache:
+    """Poster manifests for every output folder touched by a batch"""
+
+    def __init__(self):
+        self.manifests = {}
+
+    def manifest_for(self, video_path):
+        folder = Path(video_path).parent
+        if folder not in self.manifests:
+            self.manifests[folder] = PosterManifest(folder)
+        return self.manifests[folder]
+
+    def is_fresh(self, video_path, settings):
+        return self.manifest_for(video_path).is_fresh(video_path, settings)
+
+    def record(self, video_path, settings, poster_path, seek_mode=None, outputs=None):
+        self.manifest_for(video_path).record(video_path, settings, poster_path, seek_mode, outputs)
+
+    def split_stale(self, video_paths, settings):
+        """Split video_paths into (stale, fresh) lists, keeping their order"""
+        stale = []
+        fresh = []
+        for video_path in video_paths:
+            if self.is_fresh(video_path, settings):
+                fresh.append(video_path)
+            else:
+                stale.append(video_path)
+        return stale, fresh
+
+    def save(self):
+        """Save every manifest that changed"""
+        for manifest in self.manifests.values():
+            try:
+                manifest.save()
+            except OSError as e:
+                print(f"Error saving poster manifest: {e}", file=sys.stderr)
@@ -0,0 +1,149 @@
+"""Poster image encoders.
+
+Each encoder turns the BGR frame produced by the poster pipeline into
+file bytes. The registry below is what the GUIs and the CLI offer:
+
+    jpeg              baseline JPEG via Pillow (the original behavior)
+    jpeg-cv2          baseline JPEG via cv2.imencode (no RGB conversion)
+    jpeg-progressive  progressive, optimized JPEG via Pillow
+    webp              WebP via Pillow
+    avif              AVIF via Pillow (needs a Pillow build with AVIF,
+                      or the pillow-avif-plugin package)
+
+encode_to_size searches for the highest quality that fits a byte budget.
+"""
+import importlib
+import io
+from abc import ABC, abstractmethod
+
+from lazy_imports import lazy_import
+
+
+def register_plugins(image_module):
+    """Register optional Pillow plugins once Pillow is first used"""
+    try:
+        importlib.import_module('pillow_avif')  # registers AVIF support on older Pillow
+    except ImportError:
+        pass
+
+
+cv2 = lazy_import('cv2')
+Image = lazy_import('PIL.Image', on_load=register_plugins)
+
+DEFAULT_ENCODER = 'jpeg'
+
+# Quality range searched by target-size mode
+MIN_SEARCH_QUALITY = 10
+MAX_SEARCH_QUALITY = 95
+
+
+class PosterEncoder(ABC):
+    """Base class: prepare() converts a BGR frame once, encode() makes the bytes"""
+
+    name = None
+    label = None
+    extension = None
+
+    def is_available(self):
+        return True
+
+    def prepare(self, frame):
+        return frame
+
+    @abstractmethod
+    def encode(self, prepared, quality):
+        """Encode a prepared frame at quality (1-100) and return the file bytes"""
+
+
+class PillowEncoder(PosterEncoder):
+    def __init__(self, name, label, extension, pil_format, **save_options):
+        self.name = name
+        self.label = label
+        self.extension = extension
+        self.pil_format = pil_format
+        self.save_options = save_options
+
+    def is_available(self):
+        Image.init()
+        return self.pil_format in Image.SAVE
+
+    def prepare(self, frame):
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    def encode(self, prepared, quality):
+        buffer = io.BytesIO()
+        prepared.save(buffer, self.pil_format, quality=quality, **self.save_options)
+        return buffer.getvalue()
+
+
+class OpenCVJpegEncoder(PosterEncoder):
+    name = 'jpeg-cv2'
+    label = "JPEG (OpenCV)"
+    extension = 'jpg'
+
+    def encode(self, prepared, quality):
+        ok, data = cv2.imencode('.jpg', prepared, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+        if not ok:
+            raise ValueError("OpenCV could not encode JPEG")
+        return data.tobytes()
+
+
+ENCODERS = {
+    encoder.name: encoder for encoder in (
+        PillowEncoder('jpeg', "JPEG", 'jpg', 'JPEG'),
+        OpenCVJpegEncoder(),
+        PillowEncoder('jpeg-progressive', "JPEG (progressive)", 'jpg', 'JPEG',
+                      progressive=True, optimize=True),
+        PillowEncoder('webp', "WebP", 'webp', 'WEBP', method=4),
+        PillowEncoder('avif', "AVIF", 'avif', 'AVIF'),
+    )
+}
+
+
+def available_encoders():
+    """Names of the encoders usable with the installed libraries"""
+    return [name for name, encoder in ENCODERS.items() if encoder.is_available()]
+
+
+def get_encoder(name):
+    """Look up an encoder by name, raising ValueError if unknown or unavailable"""
+    encoder = ENCODERS.get(name)
+    if encoder is None:
+        raise ValueError(f"Unknown poster format '{name}'")
+    if not encoder.is_available():
+        raise ValueError(f"Poster format '{name}' is not supported by the installed Pillow")
+    return encoder
+
+
+def encode_to_size(encoder, prepared, target_bytes,
+                   min_quality=MIN_SEARCH_QUALITY, max_quality=MAX_SEARCH_QUALITY):
+    """Binary-search the highest quality whose output fits in target_bytes
+
+    Returns (data, quality). If even min_quality is over budget, the
+    min_quality encoding is returned.
+    """
+    best = None
+    low, high = min_quality, max_quality
+    while low <= high:
+        quality = (low + high) // 2
+        data = encoder.encode(prepared, quality)
+        if len(data) <= target_bytes:
+            best = (data, quality)
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        best = (encoder.encode(prepared, min_quality), min_quality)
+    return best
+
+
+def encode_poster(frame, encoder, quality, target_kb=None):
+    """Encode a BGR poster frame, returning (data, quality used)
+
+    With target_kb, quality is searched to fit the budget instead.
+    """
+    prepared = encoder.prepare(frame)
+    if target_kb:
+        return encode_to_size(encoder, prepared, int(target_kb * 1024))
+    return encoder.encode(prepared, quality), quality
@@ -0,0 +1,1018 @@
+"""Headless poster extraction.
+
+The extraction logic used by the Video Poster Generator, without any Tk
+dependency, plus a command-line entry point for batch runs on machines
+with no display:
+
+    python poster_extractor.py clips/ extra.mp4 --position 25 --quality 85 --size 640x360 --workers 4
+
+Each finished file is written to stdout as a tab-separated line
+(OK/FAIL, video path, poster path or error, seek cost) as soon as it
+completes. With --watch, the folders are then polled for new exports,
+which are processed as soon as each MP4 and its XMP sidecar have
+finished writing.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+import concurrent.futures
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+
+import memory_budget
+import poster_trace
+from frame_scoring import score_frames
+from lazy_imports import is_available, lazy_import
+from poster_cache import PosterCache, poster_settings
+from poster_encoders import DEFAULT_ENCODER, ENCODERS, encode_poster, get_encoder
+from watch_folder import BATCH_SIZE, POLL_INTERVAL, SETTLE_SECONDS, FolderWatcher, watch
+
+# Imported on first use, so the module itself loads quickly
+cv2 = lazy_import('cv2')
+np = lazy_import('numpy')
+av = lazy_import('av', optional=True)  # PyAV, optional - enables true keyframe seeking
+
+# Seek strategies
+SEEK_EXACT = 'exact'        # Decode forward from the previous keyframe to the exact frame
+SEEK_KEYFRAME = 'keyframe'  # Grab the keyframe at or before the position, no forward decode
+SEEK_MODES = (SEEK_EXACT, SEEK_KEYFRAME)
+
+# Poster frame selection
+POSTER_FIXED = 'fixed'  # Use the frame at the requested position
+POSTER_AUTO = 'auto'    # Pick the best-scoring frame in a window around it
+POSTER_MODES = (POSTER_FIXED, POSTER_AUTO)
+
+# Auto mode samples this many frames within +/- this many seconds of the position
+AUTO_SAMPLES = 9
+AUTO_WINDOW_SECONDS = 1.0
+
+# Maximum width of each tile in a contact sheet
+CONTACT_TILE_WIDTH = 480
+
+
+# Decoder threads for videos opened in this process (None = backend default),
+# set by configure_threads
+DECODER_THREADS = None
+
+
+def configure_threads(cv2_threads=None, decoder_threads=None):
+    """Set OpenCV's thread pool size and the per-video decoder threads for this process
+
+    Used as the initializer of worker pools, so that N workers don't each
+    start a thread pool the size of the machine. None keeps the default.
+    """
+    global DECODER_THREADS
+    if cv2_threads is not None:
+        cv2.setNumThreads(cv2_threads)
+    DECODER_THREADS = decoder_threads
+
+
+def worker_pool(workers, threads=None):
+    """A process pool whose workers apply threads, a (cv2_threads, decoder_threads) pair"""
+    # concurrent.futures loads its process pool (and multiprocessing) on first access
+    if threads is None:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=configure_threads,
+                                                  initargs=tuple(threads))
+
+
+def is_split_screen(width, height):
+    """Detect if video is split-screen format (width ≈ 2x height)"""
+    ratio = width / height if height > 0 else 0
+    return ratio >= 1.8  # Auto-detect split screen
+
+
+def resolve_seek_mode(seek_mode):
+    """The seek mode that is actually used: keyframe seeking needs PyAV, otherwise it falls back to exact"""
+    if seek_mode == SEEK_KEYFRAME and is_available(av):
+        return SEEK_KEYFRAME
+    return SEEK_EXACT
+
+
+def used_seek_mode(stats, seek_mode):
+    """The seek mode an extraction used, from its stats
+
+    Sequential reads (auto mode, extra positions) report 'sequential', so
+    for those the requested seek_mode is resolved instead.
+    """
+    used = stats.get('seek_mode')
+    return used if used in SEEK_MODES else resolve_seek_mode(seek_mode)
+
+
+def output_paths(result, stats):
+    """Every file an extraction wrote: the poster, then any extra-position
+    posters and the contact sheet recorded in its stats"""
+    outputs = list(stats.get('posters') or [result])
+    if 'contact_sheet' in stats:
+        outputs.append(stats['contact_sheet'])
+    return outputs
+
+
+def frame_index(position_percent, total_frames):
+    """Convert a percentage position into a frame number within bounds"""
+    frame_number = int((position_percent / 100.0) * total_frames)
+    return max(0, min(frame_number, total_frames - 1))
+
+
+class VideoProbe:
+    """A video opened once per run, with its properties read up front
+
+    fps, frame_count, width, height and duration are probed when the file
+    is opened, and the same handle is kept for seeking, so each container
+    is parsed only once however many steps need it. Use it as a context
+    manager, or call close() when done.
+    """
+
+    def __init__(self, video_path, seek_mode=SEEK_EXACT):
+        self.video_path = str(video_path)
+        # Keyframe seeking needs PyAV; otherwise fall back to OpenCV's exact seek
+        self.seek_mode = resolve_seek_mode(seek_mode)
+        self.fps = 0.0
+        self.frame_count = 0
+        self.width = 0
+        self.height = 0
+        self.error = None
+        self._cap = None
+        self._container = None
+        self._stream = None
+
+        if self.seek_mode == SEEK_KEYFRAME:
+            self._open_av()
+        else:
+            self._open_cv2()
+
+    def _open_cv2(self):
+        if DECODER_THREADS and hasattr(cv2, 'CAP_PROP_N_THREADS'):
+            self._cap = cv2.VideoCapture(self.video_path, cv2.CAP_ANY,
+                                         [cv2.CAP_PROP_N_THREADS, DECODER_THREADS])
+        else:
+            self._cap = cv2.VideoCapture(self.video_path)
+        if not self._cap.isOpened():
+            self.error = "Could not open video file"
+            return
+
+        # Get video properties
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def _open_av(self):
+        try:
+            self._container = av.open(self.video_path)
+        except Exception:
+            self.error = "Could not open video file"
+            return
+        if not self._container.streams.video:
+            self.error = "Could not open video file"
+            return
+        self._stream = self._container.streams.video[0]
+        if DECODER_THREADS:
+            self._stream.codec_context.thread_count = DECODER_THREADS
+
+        # Get video properties
+        self.fps = float(self._stream.average_rate or 0)
+        self.frame_count = self._stream.frames
+        if self.frame_count <= 0 and self._stream.duration and self._stream.time_base:
+            self.frame_count = int(self._stream.duration * self._stream.time_base * self.fps)
+        self.width = self._stream.codec_context.width
+        self.height = self._stream.codec_context.height
+
+    @property
+    def is_open(self):
+        return self.error is None
+
+    @property
+    def is_valid(self):
+        """True if the video opened and has usable fps and frame count"""
+        return self.is_open and self.frame_count > 0 and self.fps > 0
+
+    @property
+    def duration(self):
+        """Duration in seconds (0 if fps is unknown)"""
+        return self.frame_count / self.fps if self.fps > 0 else 0
+
+    @property
+    def is_split_screen(self):
+        return is_split_screen(self.width, self.height)
+
+    def seek(self, frame_number):
+        """Position the decoder for frame_number (the keyframe at or before it in keyframe mode)"""
+        if self.seek_mode == SEEK_KEYFRAME:
+            target_pts = int(frame_number / self.fps / self._stream.time_base) + (self._stream.start_time or 0)
+            self._container.seek(target_pts, stream=self._stream, backward=True, any_frame=False)
+        else:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+    def decode(self):
+        """Decode the next frame as a BGR array, or None at the end of the stream"""
+        if self.seek_mode == SEEK_KEYFRAME:
+            decoded = next(self._container.decode(self._stream), None)
+            return decoded.to_ndarray(format='bgr24') if decoded is not None else None
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def read_frame(self, frame_number, trace=None):
+        """Seek to frame_number and read it, returning (frame, error, seek_ms)"""
+        seek_start = time.perf_counter()
+        with poster_trace.stage(trace, 'seek'):
+            self.seek(frame_number)
+        with poster_trace.stage(trace, 'decode'):
+            frame = self.decode()
+        seek_ms = (time.perf_counter() - seek_start) * 1000
+
+        if frame is None:
+            return None, "Could not read frame at specified position", seek_ms
+        return frame, None, seek_ms
+
+    def read_frames(self, frame_numbers):
+        """Read several frames in one forward decode pass
+
+        Seeks once to the first requested frame and then decodes forward,
+        which is much cheaper than one random seek per frame on long-GOP
+        sources. Returns ({frame_number: frame}, error, read_ms).
+        """
+        targets = sorted(set(frame_numbers))
+        frames = {}
+        read_start = time.perf_counter()
+
+        if self.seek_mode == SEEK_KEYFRAME:
+            time_base = self._stream.time_base
+            start_pts = self._stream.start_time or 0
+            target_pts = int(targets[0] / self.fps / time_base) + start_pts
+            self._container.seek(target_pts, stream=self._stream, backward=True, any_frame=False)
+            pending = iter(targets)
+            wanted = next(pending)
+            for decoded in self._container.decode(self._stream):
+                if decoded.pts is None:
+                    continue
+                current = round(float((decoded.pts - start_pts) * time_base) * self.fps)
+                if current < wanted:
+                    continue
+                image = decoded.to_ndarray(format='bgr24')
+                # One decoded frame can satisfy several targets that fall before it
+                while wanted is not None and wanted <= current:
+                    frames[wanted] = image
+                    wanted = next(pending, None)
+                if wanted is None:
+                    break
+        else:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, targets[0])
+            current = targets[0]
+            for target in targets:
+                # Decode forward without converting the frames we skip
+                while current < target:
+                    if not self._cap.grab():
+                        break
+                    current += 1
+                if current != target or not self._cap.grab():
+                    break
+                current += 1
+                ret, image = self._cap.retrieve()
+                if not ret:
+                    break
+                frames[target] = image
+        read_ms = (time.perf_counter() - read_start) * 1000
+
+        if len(frames) < len(targets):
+            return frames, "Could not read all requested frames", read_ms
+        return frames, None, read_ms
+
+    def close(self):
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
+        if self._container is not None:
+            self._container.close()
+            self._container = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def open_probe(video_path, seek_mode=SEEK_EXACT, trace=None):
+    """Open a VideoProbe, recording the 'open' stage in trace"""
+    with poster_trace.stage(trace, 'open'):
+        return VideoProbe(video_path, seek_mode)
+
+
+def read_frame(video_path, position_percent, seek_mode=SEEK_EXACT, probe=None, trace=None):
+    """Read the BGR frame at position_percent of the video
+
+    Returns (frame, error, seek_info). frame is None on failure, and
+    seek_info holds the seek mode actually used and its cost in ms.
+    Keyframe mode needs PyAV; without it the exact seek is used. Pass an
+    open VideoProbe to reuse its handle instead of opening the file again.
+    """
+    own_probe = probe is None
+    if own_probe:
+        probe = open_probe(video_path, seek_mode, trace)
+
+    try:
+        seek_info = {'seek_mode': probe.seek_mode, 'seek_ms': 0.0}
+        if not probe.is_open:
+            return None, probe.error, seek_info
+        if not probe.is_valid:
+            return None, "Invalid video properties", seek_info
+
+        frame_number = frame_index(position_percent, probe.frame_count)
+        frame, error, seek_info['seek_ms'] = probe.read_frame(frame_number, trace)
+        return frame, error, seek_info
+    finally:
+        if own_probe:
+            probe.close()
+
+
+def crop_view(frame, crop_half=None):
+    """Pipeline stage 1: crop to the poster region as a view (no copy)
+
+    crop_half=None auto-detects split-screen frames; True/False forces it.
+    """
+    height, width = frame.shape[:2]
+    if crop_half is None:
+        crop_half = is_split_screen(width, height)
+    if crop_half:
+        return frame[:, :width//2]  # Take left 50%
+    return frame
+
+
+def downscale(frame, output_size=None):
+    """Pipeline stage 2: resize straight from the (cropped) BGR view
+
+    Area interpolation is used when shrinking, so a 4K frame is reduced in
+    one pass without a full-size intermediate; enlarging uses Lanczos.
+    """
+    if not output_size:
+        return frame
+    height, width = frame.shape[:2]
+    if tuple(output_size) == (width, height):
+        return frame
+    shrinking = output_size[0] <= width and output_size[1] <= height
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+    return cv2.resize(frame, tuple(output_size), interpolation=interpolation)
+
+
+def render_frame(frame, output_size=None, crop_half=None):
+    """Run the crop and downscale stages and return the poster-sized BGR array
+
+    Only the final, poster-sized frame is ever allocated in full; the crop
+    is a view into the decoded frame, and color conversion (if the encoder
+    needs it) happens afterwards on the small frame.
+    """
+    return downscale(crop_view(frame, crop_half), output_size)
+
+
+def poster_path_for(video_path, suffix='', extension='jpg'):
+    """Output path for a poster, e.g. clip.mp4 -> clip-poster.jpg or clip-poster-50.webp"""
+    path = Path(video_path)
+    return path.parent / f"{path.stem}-poster{suffix}.{extension}"
+
+
+def contact_sheet_path_for(video_path, extension='jpg'):
+    path = Path(video_path)
+    return path.parent / f"{path.stem}-contact.{extension}"
+
+
+def save_poster(frame, output_path, encoder, quality, target_kb=None, trace=None):
+    """Encode a poster-sized BGR frame and write it, returning (quality used, bytes written)"""
+    with poster_trace.stage(trace, 'encode'):
+        data, quality = encode_poster(frame, encoder, quality, target_kb)
+    with poster_trace.stage(trace, 'write'):
+        with open(output_path, 'wb') as f:
+            f.write(data)
+    return quality, len(data)
+
+
+def build_contact_sheet(frames, tile_width=CONTACT_TILE_WIDTH):
+    """Tile poster frames into one roughly square BGR grid"""
+    columns = math.ceil(math.sqrt(len(frames)))
+    rows = math.ceil(len(frames) / columns)
+
+    height, width = frames[0].shape[:2]
+    tile_width = min(tile_width, width)
+    tile_height = round(height * tile_width / width)
+
+    sheet = np.zeros((rows * tile_height, columns * tile_width, 3), dtype=np.uint8)
+    for i, frame in enumerate(frames):
+        top = (i // columns) * tile_height
+        left = (i % columns) * tile_width
+        sheet[top:top + tile_height, left:left + tile_width] = downscale(frame, (tile_width, tile_height))
+    return sheet
+
+
+def read_best_frame(video_path, position_percent, seek_mode=SEEK_EXACT, probe=None, trace=None):
+    """Read the best-looking frame near position_percent
+
+    Samples AUTO_SAMPLES frames within AUTO_WINDOW_SECONDS of the position
+    in one forward decode pass, scores them with frame_scoring and returns
+    (frame, error, info) where info holds the read cost and chosen frame.
+    """
+    own_probe = probe is None
+    if own_probe:
+        probe = open_probe(video_path, seek_mode, trace)
+
+    try:
+        info = {'seek_mode': 'sequential', 'seek_ms': 0.0}
+        if not probe.is_open:
+            return None, probe.error, info
+        if not probe.is_valid:
+            return None, "Invalid video properties", info
+
+        center = frame_index(position_percent, probe.frame_count)
+        window = max(1, int(AUTO_WINDOW_SECONDS * probe.fps))
+        first = max(0, center - window)
+        last = min(probe.frame_count - 1, center + window)
+        step = max(1, (last - first) // (AUTO_SAMPLES - 1))
+        frame_numbers = list(range(first, last + 1, step))
+
+        with poster_trace.stage(trace, 'read'):
+            frames, error, info['seek_ms'] = probe.read_frames(frame_numbers)
+        if not frames:
+            return None, error or "Could not read frame at specified position", info
+
+        # Score only the part of the frame that ends up in the poster
+        candidates = sorted(frames)
+        views = [frames[n] for n in candidates]
+        if probe.is_split_screen:
+            views = [view[:, :view.shape[1]//2] for view in views]
+        with poster_trace.stage(trace, 'score'):
+            best, scores = score_frames(views)
+
+        info['auto_frame'] = candidates[best]
+        info['auto_score'] = float(scores[best])
+        return frames[candidates[best]], None, info
+    finally:
+        if own_probe:
+            probe.close()
+
+
+def extract_poster(video_path, position_percent, quality, output_size=None,
+                   seek_mode=SEEK_EXACT, stats=None, probe=None,
+                   extra_positions=None, contact_sheet=False, poster_mode=POSTER_FIXED,
+                   encoder=DEFAULT_ENCODER, target_kb=None, trace=None, crop_half=None):
+    """Extract poster frame from video
+
+    If a stats dict is passed it is filled with the seek mode used and the
+    seek cost in milliseconds, plus the quality used and bytes written. An
+    open VideoProbe can be passed to reuse it. encoder names the output
+    format (see poster_encoders); with target_kb the quality is searched to
+    fit that size instead. With poster_mode='auto' the best frame near the
+    position is used (see read_best_frame). With extra_positions, see
+    extract_multi_poster; the extra positions always use fixed frames. A
+    poster_trace.Trace records the time spent in each stage. crop_half
+    forces the left-half crop on or off; by default split-screen frames
+    are detected (see render_frame).
+    """
+    if extra_positions:
+        return extract_multi_poster(video_path, [position_percent] + list(extra_positions), quality,
+                                    output_size, seek_mode=seek_mode, stats=stats, probe=probe,
+                                    contact_sheet=contact_sheet, encoder=encoder, target_kb=target_kb,
+                                    trace=trace, crop_half=crop_half)
+    if poster_mode == POSTER_AUTO:
+        reader = read_best_frame
+    else:
+        reader = read_frame
+    try:
+        poster_encoder = get_encoder(encoder)
+
+        # Seek and read frame
+        frame, error, seek_info = reader(video_path, position_percent, seek_mode, probe=probe, trace=trace)
+        if stats is not None:
+            stats.update(seek_info)
+
+        if frame is None:
+            return False, error
+
+        # Crop and resize, then encode
+        with poster_trace.stage(trace, 'render'):
+            poster = render_frame(frame, output_size, crop_half)
+        output_path = poster_path_for(video_path, extension=poster_encoder.extension)
+        used_quality, size = save_poster(poster, output_path, poster_encoder, quality, target_kb, trace)
+        if stats is not None:
+            stats.update({'quality': used_quality, 'bytes': size})
+
+        return True, str(output_path)
+
+    except Exception as e:
+        return False, str(e)
+
+
+def extract_multi_poster(video_path, positions, quality, output_size=None,
+                         seek_mode=SEEK_EXACT, stats=None, probe=None, contact_sheet=False,
+                         encoder=DEFAULT_ENCODER, target_kb=None, trace=None, crop_half=None):
+    """Extract frames at several positions from one sequential decode pass
+
+    The first position is saved as the usual -poster.<ext>, the others as
+    -poster-<position>.<ext>. With contact_sheet, all of them are also
+    tiled into -contact.<ext>. Returns (success, main poster path or
+    error); stats receives the list of every poster written and the
+    contact sheet path.
+    """
+    own_probe = probe is None
+    try:
+        poster_encoder = get_encoder(encoder)
+        if own_probe:
+            probe = open_probe(video_path, seek_mode, trace)
+        if stats is not None:
+            stats.update({'seek_mode': 'sequential', 'seek_ms': 0.0})
+
+        if not probe.is_open:
+            return False, probe.error
+        if not probe.is_valid:
+            return False, "Invalid video properties"
+
+        frame_numbers = [frame_index(position, probe.frame_count) for position in positions]
+        with poster_trace.stage(trace, 'read'):
+            frames, error, read_ms = probe.read_frames(frame_numbers)
+        if stats is not None:
+            stats['seek_ms'] = read_ms
+        if error:
+            return False, error
+
+        posters = []
+        outputs = []
+        for i, (position, frame_number) in enumerate(zip(positions, frame_numbers)):
+            with poster_trace.stage(trace, 'render'):
+                poster = render_frame(frames[frame_number], output_size, crop_half)
+            output_path = poster_path_for(video_path, '' if i == 0 else f"-{position:g}",
+                                          poster_encoder.extension)
+            used_quality, size = save_poster(poster, output_path, poster_encoder, quality, target_kb, trace)
+            if i == 0 and stats is not None:
+                stats.update({'quality': used_quality, 'bytes': size})
+            posters.append(poster)
+            outputs.append(str(output_path))
+
+        if stats is not None:
+            stats['posters'] = outputs
+
+        if contact_sheet:
+            # Tile in timeline order regardless of the order positions were given
+            ordered = [poster for _, poster in sorted(zip(positions, posters), key=lambda item: item[0])]
+            sheet_path = contact_sheet_path_for(video_path, poster_encoder.extension)
+            with poster_trace.stage(trace, 'contact_sheet'):
+                save_poster(build_contact_sheet(ordered), sheet_path, poster_encoder, quality)
+            if stats is not None:
+                stats['contact_sheet'] = str(sheet_path)
+
+        return True, outputs[0]
+
+    except Exception as e:
+        return False, str(e)
+    finally:
+        if own_probe and probe is not None:
+            probe.close()
+
+
+def _extract_job(video_path, position_percent, quality, output_size, options, traced=False):
+    """Run extract_poster and return its result together with the collected stats
+
+    With traced, stats['trace'] holds the file's poster_trace.Trace. The
+    worker's pid and peak RSS so far are added as stats['pid'] and
+    stats['peak_rss'] (see memory_budget.PeakRSS).
+    """
+    stats = {}
+    trace = poster_trace.Trace(video_path) if traced else None
+    with poster_trace.stage(trace, 'total'):
+        success, result = extract_poster(video_path, position_percent, quality, output_size,
+                                         stats=stats, trace=trace, **options)
+    if trace is not None:
+        stats['trace'] = trace
+    stats['pid'] = os.getpid()
+    stats['peak_rss'] = memory_budget.peak_rss()
+    return success, result, stats
+
+
+def frames_held(poster_mode=POSTER_FIXED, extra_positions=None, **options):
+    """How many full-size frames one job keeps in memory at once with these extract_poster options"""
+    if extra_positions:
+        return 1 + len(extra_positions)
+    return AUTO_SAMPLES if poster_mode == POSTER_AUTO else 1
+
+
+def job_bytes(video_path, frames=1):
+    """Estimated peak frame memory of a job on video_path holding `frames` full-size frames
+
+    The size comes from the MP4 header; files it can't be read from are
+    probed with a decoder. Unreadable files cost nothing (they fail fast).
+    """
+    size = memory_budget.mp4_dimensions(video_path)
+    if size is None:
+        with VideoProbe(video_path) as probe:
+            size = (probe.width, probe.height)
+    return memory_budget.estimate_job_bytes(*size, frames_held=frames)
+
+
+def find_videos(paths, recursive=False):
+    """Expand file and directory arguments into an ordered list of MP4 files"""
+    videos = []
+    seen = set()
+
+    for arg in paths:
+        path = Path(arg)
+        if path.is_dir():
+            pattern = '**/*' if recursive else '*'
+            candidates = sorted(p for p in path.glob(pattern) if p.is_file())
+        else:
+            candidates = [path]
+
+        for candidate in candidates:
+            video_path = str(candidate)
+            if candidate.suffix.lower() == '.mp4' and video_path not in seen:
+                seen.add(video_path)
+                videos.append(video_path)
+
+    return videos
+
+
+def stream_jobs(job, items, workers=1, max_in_flight=None, executor=None, threads=None, governor=None,
+                cost=None):
+    """Run job(*args) for each (key, args) in items, yielding (key, result) as each finishes
+
+    items may be any iterable, including a generator over millions of
+    paths: it is only consumed as jobs complete, so at most max_in_flight
+    jobs (default: two per worker) are queued or running at once, and
+    results arrive in completion order. A job that raised, or whose worker
+    process died, yields the exception as its result.
+
+    Jobs run in a pool of `workers` processes (each applying threads, see
+    worker_pool), or in `executor` if one is given; with workers=1 and no
+    executor they run one at a time in this process. Closing the generator
+    early cancels the jobs not yet started.
+
+    With a memory_budget.MemoryGovernor, each job also reserves cost(*args)
+    bytes of the governor's budget while it is queued or running; a job
+    that doesn't fit waits (and holds back the ones after it) until enough
+    earlier jobs finish.
+    """
+    items = iter(items)
+
+    if executor is None and workers <= 1:
+        if threads is not None:
+            configure_threads(*threads)
+        for key, args in items:
+            size = cost(*args) if governor is not None else 0
+            if governor is not None:
+                governor.acquire(size)
+            try:
+                result = job(*args)
+            except Exception as e:
+                result = e
+            finally:
+                if governor is not None:
+                    governor.release(size)
+            yield key, result
+        return
+
+    limit = max(1, max_in_flight or 2 * workers)
+    pool = worker_pool(workers, threads) if executor is None else executor
+    pending = {}
+    held = None  # next (item, size), waiting for budget
+    try:
+        while True:
+            # Top up to the limit, pulling only as many items as can be queued
+            while len(pending) < limit:
+                if held is None:
+                    item = next(items, None)
+                    if item is None:
+                        break
+                    held = (item, cost(*item[1]) if governor is not None else 0)
+                (key, args), size = held
+                if governor is not None:
+                    if not pending:
+                        governor.acquire(size)
+                    elif not governor.try_acquire(size):
+                        break
+                held = None
+                pending[pool.submit(job, *args)] = (key, size)
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key, size = pending.pop(future)
+                if governor is not None:
+                    governor.release(size)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+                yield key, result
+    finally:
+        for future, (_, size) in pending.items():
+            future.cancel()
+            if governor is not None:
+                governor.release(size)
+        if executor is None:
+            pool.shutdown()
+
+
+def run_batch(video_paths, position_percent, quality, output_size=None, workers=1, tracer=None,
+              threads=None, max_in_flight=None, governor=None, rss=None, **options):
+    """Extract posters for many videos, yielding (video_path, success, result, stats) as each finishes
+
+    Extra keyword options (seek_mode, extra_positions, contact_sheet,
+    poster_mode, encoder, target_kb, crop_half) are passed on to
+    extract_poster. video_paths may be any iterable, and is read lazily
+    with at most max_in_flight files queued (see stream_jobs). With more
+    than one worker the files are decoded in a process pool and results
+    arrive in completion order, not queue order. If a
+    poster_trace.TraceWriter is given as tracer, each file's stage spans
+    are written to it as the file finishes. threads, a (cv2_threads,
+    decoder_threads) pair such as auto_tune picks, is applied in every
+    worker. A memory_budget.MemoryGovernor limits the estimated frame
+    memory of the files in flight (see job_bytes), and a
+    memory_budget.PeakRSS given as rss records each worker's peak RSS.
+    """
+    traced = tracer is not None
+    jobs = ((video_path, (video_path, position_percent, quality, output_size, options, traced))
+            for video_path in video_paths)
+    frames = frames_held(**options)
+
+    def cost(video_path, *args):
+        return job_bytes(video_path, frames)
+
+    for video_path, outcome in stream_jobs(_extract_job, jobs, workers, max_in_flight, threads=threads,
+                                           governor=governor, cost=cost):
+        if isinstance(outcome, Exception):
+            # A worker process died (e.g. decoder crash)
+            success, result, stats = False, str(outcome), {}
+        else:
+            success, result, stats = outcome
+        if traced:
+            tracer.write(stats.pop('trace', None))
+        if rss is not None:
+            rss.record(stats)
+        yield video_path, success, result, stats
+
+
+def format_seek(stats):
+    """Describe the seek cost recorded in a stats dict, e.g. 'seek=exact 12.3ms'"""
+    if 'seek_ms' not in stats:
+        return "seek=n/a"
+    return f"seek={stats['seek_mode']} {stats['seek_ms']:.1f}ms"
+
+
+def parse_size(value):
+    """Parse a WIDTHxHEIGHT argument"""
+    try:
+        width, height = value.lower().split('x')
+        size = (int(width), int(height))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}' (expected WIDTHxHEIGHT, e.g. 640x360)")
+    if size[0] <= 0 or size[1] <= 0:
+        raise argparse.ArgumentTypeError(f"invalid size '{value}' (width and height must be positive)")
+    return size
+
+
+def parse_quality(value):
+    """Parse a JPEG quality argument (1-100)"""
+    quality = int(value)
+    if not 1 <= quality <= 100:
+        raise argparse.ArgumentTypeError("quality must be between 1 and 100")
+    return quality
+
+
+def parse_positive_int(value):
+    """Parse a count that must be at least 1 (workers, batch size)"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def parse_seconds(value):
+    """Parse a duration in seconds (must not be negative)"""
+    seconds = float(value)
+    if not seconds >= 0:
+        raise argparse.ArgumentTypeError("must not be negative")
+    return seconds
+
+
+def parse_interval(value):
+    """Parse a polling interval in seconds (must be positive)"""
+    seconds = float(value)
+    if not seconds > 0:
+        raise argparse.ArgumentTypeError("must be greater than 0")
+    return seconds
+
+
+def parse_target_kb(value):
+    """Parse a target poster size in KB (must be positive)"""
+    target_kb = float(value)
+    if target_kb <= 0:
+        raise argparse.ArgumentTypeError("target size must be greater than 0 KB")
+    return target_kb
+
+
+def parse_memory_budget(value):
+    """Parse a memory budget argument such as 8G or 512M (0 disables the budget)"""
+    try:
+        return memory_budget.parse_bytes(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def memory_governor(budget, workers):
+    """A MemoryGovernor for a --memory-budget value, or None for no budget
+
+    budget=None means the default budget when running in parallel; 0 (or
+    no way to read the machine's memory) means no budget.
+    """
+    if budget is None and workers > 1:
+        budget = memory_budget.default_budget()
+    return memory_budget.MemoryGovernor(budget) if budget else None
+
+
+def parse_positions(value):
+    """Parse a comma-separated list of frame positions, e.g. '10,50,75'"""
+    return [parse_position(part) for part in value.split(',') if part.strip()]
+
+
+def parse_position(value):
+    """Parse a frame position argument (0-100%)"""
+    position = float(value)
+    if not 0 <= position <= 100:
+        raise argparse.ArgumentTypeError("position must be between 0 and 100")
+    return position
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate -poster thumbnails for MP4 files without a GUI.")
+    parser.add_argument('paths', nargs='+',
+                        help="MP4 files and/or folders containing MP4 files")
+    parser.add_argument('-p', '--position', type=parse_position, default=25.0,
+                        help="frame position as a percentage of the video (default: 25)")
+    parser.add_argument('-q', '--quality', type=parse_quality, default=85,
+                        help="quality 1-100 (default: 85)")
+    parser.add_argument('--format', dest='encoder', choices=list(ENCODERS), default=DEFAULT_ENCODER,
+                        help="poster format/encoder (default: jpeg)")
+    parser.add_argument('--target-kb', type=parse_target_kb, default=None,
+                        help="search for the highest quality that keeps each poster under this many KB")
+    parser.add_argument('-s', '--size', type=parse_size, default=None,
+                        help="output size as WIDTHxHEIGHT (default: original size)")
+    parser.add_argument('--extra-positions', type=parse_positions, default=None, metavar='P1,P2,...',
+                        help="also save frames at these positions as -poster-<P>.jpg, "
+                             "read in one sequential decode pass")
+    parser.add_argument('--contact-sheet', action='store_true',
+                        help="tile the poster and extra positions into -contact.jpg")
+    parser.add_argument('--auto', dest='poster_mode', action='store_const',
+                        const=POSTER_AUTO, default=POSTER_FIXED,
+                        help="pick the sharpest non-black frame near the position instead of the exact frame")
+    parser.add_argument('--seek', choices=SEEK_MODES, default=SEEK_EXACT,
+                        help="seek strategy: 'exact' frame or nearest 'keyframe' (faster, needs PyAV) "
+                             "(default: exact)")
+    parser.add_argument('-w', '--workers', type=parse_positive_int, default=None,
+                        help="number of parallel worker processes (default: the auto-tuned count, else 1)")
+    parser.add_argument('--tune', action='store_true',
+                        help="first time worker and thread settings on a sample of the videos and save "
+                             "the fastest for later runs (see auto_tune.py)")
+    parser.add_argument('--memory-budget', metavar='SIZE', type=parse_memory_budget, default=None,
+                        help="most estimated frame memory in flight across workers, e.g. 8G; larger videos "
+                             "wait for earlier ones to finish (default: half the RAM with several workers, "
+                             "0 for no limit)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="search folders recursively")
+    parser.add_argument('-f', '--force', action='store_true',
+                        help="regenerate posters even if they are up to date")
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help="append per-stage timings to FILE as JSON Lines and print a summary")
+    add_watch_arguments(parser)
+    return parser
+
+
+def add_watch_arguments(parser):
+    """Watch-folder options shared by the poster and theme command lines"""
+    group = parser.add_argument_group("watch mode")
+    group.add_argument('--watch', action='store_true',
+                       help="after processing, keep watching the folders and process new exports as they land")
+    group.add_argument('--interval', type=parse_interval, default=POLL_INTERVAL,
+                       help=f"seconds between folder polls (default: {POLL_INTERVAL:g})")
+    group.add_argument('--settle', type=parse_seconds, default=SETTLE_SECONDS,
+                       help=f"seconds a file must stay unchanged before it is used (default: {SETTLE_SECONDS:g})")
+    group.add_argument('--batch-size', type=parse_positive_int, default=BATCH_SIZE,
+                       help=f"most new videos to process at once (default: {BATCH_SIZE})")
+    group.add_argument('--no-xmp', action='store_true',
+                       help="don't wait for each video's .xmp sidecar before processing it")
+
+
+def extract_batch(videos, args, cache, settings, tracer=None):
+    """Extract posters for videos per the parsed CLI args, printing one line per file
+
+    Returns the number of files that succeeded or were already up to date.
+    The batch's peak RSS is printed at the end.
+    """
+    success_count = 0
+    governor = memory_governor(args.memory_budget, args.workers)
+    rss = memory_budget.PeakRSS()
+
+    # Skip posters whose source and settings are unchanged since the last run
+    if args.force:
+        stale = videos
+    else:
+        stale, fresh = cache.split_stale(videos, settings)
+        for video_path in fresh:
+            success_count += 1
+            print(f"SKIP\t{video_path}\tup to date", flush=True)
+
+    try:
+        results = run_batch(stale, args.position, args.quality, args.size, workers=args.workers,
+                            tracer=tracer, threads=args.threads, governor=governor, rss=rss,
+                            seek_mode=args.seek, extra_positions=args.extra_positions,
+                            contact_sheet=args.contact_sheet, poster_mode=args.poster_mode,
+                            encoder=args.encoder, target_kb=args.target_kb)
+        for video_path, success, result, stats in results:
+            seek = format_seek(stats)
+            if 'auto_frame' in stats:
+                seek += f"\tframe={stats['auto_frame']}"
+            if success:
+                success_count += 1
+                cache.record(video_path, settings, result, used_seek_mode(stats, args.seek),
+                             output_paths(result, stats))
+                print(f"OK\t{video_path}\t{result}\t{seek}", flush=True)
+            else:
+                print(f"FAIL\t{video_path}\t{result}\t{seek}", flush=True)
+    finally:
+        cache.save()
+    if stale:
+        print(rss.format(governor), file=sys.stderr, flush=True)
+
+    return success_count
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    watch_dirs = [path for path in args.paths if Path(path).is_dir()]
+    if args.watch and not watch_dirs:
+        print("--watch needs at least one folder", file=sys.stderr)
+        return 2
+    # Snapshot the folders before listing them, so exports that land while
+    # the initial batch runs are picked up by the watcher
+    watcher = None
+    if args.watch:
+        watcher = FolderWatcher(watch_dirs, recursive=args.recursive, settle_seconds=args.settle,
+                                require_xmp=not args.no_xmp)
+
+    videos = find_videos(args.paths, recursive=args.recursive)
+    if not videos and not args.watch:
+        print("No MP4 files found", file=sys.stderr)
+        return 1
+
+    try:
+        get_encoder(args.encoder)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    # auto_tune imports this module, so it is imported here rather than at the top
+    import auto_tune
+    tuning = auto_tune.load_tuning()
+    if args.tune and videos:
+        tuning = auto_tune.calibrate(videos, args.position, args.size, args.seek, args.encoder, args.quality,
+                                     on_status=lambda text: print(text, file=sys.stderr, flush=True))
+        print(auto_tune.format_results(tuning), file=sys.stderr)
+        auto_tune.save_tuning(tuning)
+    if args.workers is None:
+        args.workers = tuning['workers'] if tuning else 1
+    args.threads = auto_tune.tuned_threads(tuning, args.workers)
+
+    cache = PosterCache()
+    # Compare against the seek mode this run will really use, so posters made
+    # with the exact fallback are redone once PyAV is installed
+    settings = poster_settings(args.position, args.quality, args.size, resolve_seek_mode(args.seek),
+                               args.extra_positions, args.contact_sheet, args.poster_mode,
+                               args.encoder, args.target_kb)
+    tracer = poster_trace.TraceWriter(args.trace) if args.trace else None
+    total = len(videos)
+    success_count = 0
+
+    def handle_batch(batch):
+        nonlocal total, success_count
+        total += len(batch)
+        success_count += extract_batch(batch, args, cache, settings, tracer)
+
+    try:
+        success_count = extract_batch(videos, args, cache, settings, tracer)
+        if watcher is not None:
+            # Then keep picking up new exports until interrupted
+            print(f"Watching {', '.join(watch_dirs)} for new MP4 files (Ctrl+C to stop)",
+                  file=sys.stderr, flush=True)
+            watch(watcher, handle_batch, interval=args.interval, batch_size=args.batch_size)
+    finally:
+        if tracer is not None:
+            tracer.close()
+
+    if tracer is not None and tracer.spans:
+        print(poster_trace.format_summary(poster_trace.summarize(tracer.spans)), file=sys.stderr)
+    print(f"Complete: {success_count}/{total} successful", file=sys.stderr)
+    return 0 if success_count == total else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
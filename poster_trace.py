@@ -0,0 +1,196 @@
+"""Opt-in per-stage tracing.
+
+When tracing is on, every file gets a Trace that records a span (start
+and end timestamp) for each stage it goes through - opening the video,
+seeking, decoding, rendering, encoding, writing, XMP parsing and so on.
+A TraceWriter appends the spans to a JSON Lines file, one span per line:
+
+    {"file": "clips/a.mp4", "stage": "seek", "start": 1718000000.12, "end": 1718000000.15, "ms": 31.2, "pid": 4242}
+
+Stages can nest (e.g. 'poster' around 'seek' and 'encode'). Summarize a
+trace with:
+
+    python poster_trace.py trace.jsonl --top 10
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# File name used when a GUI writes a trace next to the processed videos
+TRACE_NAME = 'poster-trace.jsonl'
+
+PERCENTILES = (50, 95, 99)
+
+
+class Trace:
+    """Stage spans recorded for one file
+
+    Plain data, so it can be returned from a worker process.
+    """
+
+    def __init__(self, file):
+        self.file = str(file)
+        self.spans = []
+
+    @contextmanager
+    def stage(self, name):
+        """Record the time spent in the block as a span named name"""
+        start = time.time()
+        clock = time.perf_counter()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - clock
+            span = {'stage': name, 'start': start, 'end': start + elapsed,
+                    'ms': round(elapsed * 1000, 3), 'pid': os.getpid()}
+            if error:
+                span['error'] = error
+            self.spans.append(span)
+
+
+def stage(trace, name):
+    """trace.stage(name), or a no-op context if tracing is off (trace is None)"""
+    if trace is None:
+        return nullcontext()
+    return trace.stage(name)
+
+
+class TraceWriter:
+    """Appends traces to a JSON Lines file; safe to share between threads
+
+    The spans written by this writer are also kept in self.spans, so a run
+    can be summarized without re-reading earlier runs from the same file.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.spans = []
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def write(self, trace):
+        if trace is None or not trace.spans:
+            return
+        spans = [{'file': trace.file, **span} for span in trace.spans]
+        lines = ''.join(json.dumps(span) + '\n' for span in spans)
+        with self._lock:
+            self._file.write(lines)
+            self._file.flush()
+            self.spans.extend(spans)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_trace(path):
+    """Load the spans of a JSON Lines trace, skipping malformed lines"""
+    spans = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                span = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(span, dict) and 'stage' in span and 'ms' in span:
+                spans.append(span)
+    return spans
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(spans, top=10):
+    """Per-stage percentiles and the slowest files for a list of spans
+
+    Spans of the same stage for the same file are added together first, so
+    a stage that runs several times per file (e.g. one encode per extra
+    position) counts once per file. A file's wall time runs from its first
+    span's start to its last span's end, so nested stages are not counted
+    twice.
+    """
+    per_file_stage = {}
+    file_window = {}
+    for span in spans:
+        key = (span.get('file'), span['stage'])
+        per_file_stage[key] = per_file_stage.get(key, 0.0) + span['ms']
+        if 'start' in span and 'end' in span:
+            first, last = file_window.get(span.get('file'), (span['start'], span['end']))
+            file_window[span.get('file')] = (min(first, span['start']), max(last, span['end']))
+
+    by_stage = {}
+    for (_, stage_name), ms in per_file_stage.items():
+        by_stage.setdefault(stage_name, []).append(ms)
+
+    stages = {}
+    for stage_name, values in by_stage.items():
+        values.sort()
+        summary = {'count': len(values), 'total_ms': round(sum(values), 3)}
+        for percent in PERCENTILES:
+            summary[f"p{percent}"] = round(percentile(values, percent), 3)
+        summary['max'] = round(values[-1], 3)
+        stages[stage_name] = summary
+
+    slowest = sorted(((file, (last - first) * 1000) for file, (first, last) in file_window.items()),
+                     key=lambda item: item[1], reverse=True)[:top]
+
+    return {
+        'stages': stages,
+        'slowest': [{'file': file, 'ms': round(ms, 3)} for file, ms in slowest],
+    }
+
+
+def format_summary(summary):
+    """Render a summarize() result as a plain-text table"""
+    lines = [f"{'stage':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'total ms':>12}"]
+    for stage_name, row in sorted(summary['stages'].items(), key=lambda item: item[1]['total_ms'], reverse=True):
+        lines.append(f"{stage_name:<14}{row['count']:>7}{row['p50']:>10.1f}{row['p95']:>10.1f}"
+                     f"{row['p99']:>10.1f}{row['max']:>10.1f}{row['total_ms']:>12.1f}")
+    if summary['slowest']:
+        lines.append("")
+        lines.append("Slowest files:")
+        for entry in summary['slowest']:
+            lines.append(f"{entry['ms']:>10.1f} ms  {entry['file']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a poster/theme stage trace (JSON Lines).")
+    parser.add_argument('trace', help="trace file written with --trace or the GUI's trace option")
+    parser.add_argument('--top', type=int, default=10, help="number of slowest files to list (default: 10)")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        spans = read_trace(args.trace)
+    except OSError as e:
+        print(f"Could not read trace: {e}", file=sys.stderr)
+        return 1
+    if not spans:
+        print("Trace is empty", file=sys.stderr)
+        return 1
+
+    summary = summarize(spans, top=args.top)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1001 @@
+"""Theme JSON building, without any Tk dependency.
+
+Everything the Theme JSON Generator does to turn a batch of rendered
+clips and their XMP sidecars into a theme JSON: composition-name and
+marker parsing, poster extraction, duration probing and JSON assembly.
+The GUI calls build_theme() from its worker thread; scripts and
+benchmarks can call it directly. There is also a command line, which
+can keep watching a drop folder and append new clips as they are
+exported:
+
+    python theme_builder.py themes/my-theme --base-url ./assets/media/my-theme/ --watch
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import auto_tune
+import marker_grammar
+import memory_budget
+import poster_extractor
+import poster_trace
+import theme_writer
+from poster_encoders import DEFAULT_ENCODER, ENCODERS, get_encoder
+from watch_folder import FolderWatcher, watch
+
+# Per-folder record of which JSON file is the theme, written on every save
+THEME_INDEX_NAME = '.theme-index.json'
+
+# sniff_theme_json scans the top-level keys in this much of each file
+SNIFF_BYTES = 64 * 1024
+JSON_OBJECT_START = re.compile(rb'\A(?:\xef\xbb\xbf)?\s*\{')
+JSON_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]:,]|"')
+THEME_JSON_KEYS = {'theme', 'clips'}
+
+
+@contextmanager
+def timed(timings, stage, trace=None):
+    """Add the time spent in the block to timings[stage] (seconds), if timings is given
+
+    The block is also recorded as a span in trace, if tracing is on.
+    """
+    with poster_trace.stage(trace, stage):
+        if timings is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def parse_comp_name(filename):
+    """Parse composition name from filename"""
+    name = Path(filename).stem
+    parts = name.split('-')
+
+    if len(parts) < 3:
+        return None
+
+    # Find the first part that's a valid number (the order)
+    order_index = None
+    order_num = None
+
+    for i, part in enumerate(parts):
+        try:
+            order_num = int(part)
+            order_index = i
+            break
+        except ValueError:
+            continue
+
+    if order_index is None or order_index == 0:
+        return None
+
+    # Everything before the number is the category
+    category = '-'.join(parts[:order_index])
+    # Everything after the number is the title
+    title = '-'.join(parts[order_index + 1:])
+
+    if not title:
+        return None
+
+    return {
+        'category': category,
+        'categoryOrder': order_num,
+        'title': title.replace('-', ' ').title()
+    }
+
+
+# XMP namespaces and the qualified tags the marker parser looks for
+XMP_NAMESPACES = {
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'xmpDM': 'http://ns.adobe.com/xmp/1.0/DynamicMedia/',
+    'dc': 'http://purl.org/dc/elements/1.1/'
+}
+RDF_LI = f"{{{XMP_NAMESPACES['rdf']}}}li"
+RDF_ALT = f"{{{XMP_NAMESPACES['rdf']}}}Alt"
+RDF_SEQ = f"{{{XMP_NAMESPACES['rdf']}}}Seq"
+DC_TITLE = f"{{{XMP_NAMESPACES['dc']}}}title"
+XMPDM_MARKERS = f"{{{XMP_NAMESPACES['xmpDM']}}}markers"
+XMPDM_START_TIME = f"{{{XMP_NAMESPACES['xmpDM']}}}startTime"
+XMPDM_COMMENT = f"{{{XMP_NAMESPACES['xmpDM']}}}comment"
+
+
+def parse_xmp_metadata(xmp_path, look_for_theme=False):
+    """Extract marker data from XMP file
+
+    Streams the file with iterparse and stops as soon as it has the
+    composition title and the first qualifying marker, detaching finished
+    elements as it goes, so large sidecars full of history entries are
+    neither read to the end nor held in memory.
+
+    Args:
+        xmp_path: Path to XMP file
+        look_for_theme: If True, only look at frame 0 markers. If False, look at frame 1+ markers.
+    """
+    try:
+        comp_title = None
+        marker_comment = None
+        title_found = False
+        marker_found = False
+        stack = []
+
+        for event, elem in ET.iterparse(xmp_path, events=('start', 'end')):
+            if event == 'start':
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            parent = stack[-1] if stack else None
+
+            if elem.tag == RDF_LI and len(stack) >= 2:
+                container = (stack[-2].tag, parent.tag)
+
+                # Extract composition title (dc:title/rdf:Alt/rdf:li)
+                if container == (DC_TITLE, RDF_ALT) and not title_found:
+                    comp_title = elem.text
+                    title_found = True
+
+                # Extract marker comment based on frame position (xmpDM:markers/rdf:Seq/rdf:li)
+                elif container == (XMPDM_MARKERS, RDF_SEQ) and not marker_found:
+                    start_time_elem = elem.find(XMPDM_START_TIME)
+                    comment_elem = elem.find(XMPDM_COMMENT)
+
+                    if start_time_elem is not None and comment_elem is not None:
+                        start_time = int(start_time_elem.text)
+
+                        # Frame 0 for theme, Frame 1+ for clips
+                        if look_for_theme and start_time == 0:
+                            marker_comment = comment_elem.text
+                            marker_found = True
+                        elif not look_for_theme and start_time > 0:
+                            marker_comment = comment_elem.text
+                            marker_found = True
+
+                if title_found and marker_found:
+                    break
+
+            # Fields of a resource are read when their rdf:li ends; anything else is done with
+            if parent is not None and parent.tag != RDF_LI:
+                parent.remove(elem)
+
+        return comp_title, marker_comment
+
+    except Exception as e:
+        print(f"Error parsing XMP: {e}", file=sys.stderr)
+        return None, None
+
+
+def parse_simplified_marker(marker_text):
+    """Parse simplified marker syntax into JSON structure
+
+    Malformed lines are skipped; use marker_grammar.parse_marker to get
+    them back as errors with line numbers.
+    """
+    config, _ = marker_grammar.parse_marker(marker_text)
+    return config
+
+
+def get_video_duration(video_path, probe=None):
+    """Get video duration in seconds
+
+    Reads the properties already held by probe if given, otherwise opens the file.
+    """
+    try:
+        if probe is None:
+            with poster_extractor.VideoProbe(video_path) as own_probe:
+                return get_video_duration(video_path, own_probe)
+
+        if probe.fps > 0:
+            return round(probe.duration, 2)
+        return 3
+    except Exception as e:
+        print(f"Error getting duration: {e}", file=sys.stderr)
+        return 3
+
+
+def extract_poster(video_path, position_percent, quality, output_size=None,
+                   seek_mode=poster_extractor.SEEK_EXACT, stats=None, probe=None,
+                   encoder=DEFAULT_ENCODER, target_kb=None, trace=None):
+    """Extract poster frame from video
+
+    poster_extractor.extract_poster, except that overlay clips are always
+    cropped to their left half, like split-screen renders.
+    """
+    crop_half = True if Path(video_path).stem.startswith('overlay') else None
+    return poster_extractor.extract_poster(video_path, position_percent, quality, output_size,
+                                           seek_mode=seek_mode, stats=stats, probe=probe,
+                                           encoder=encoder, target_kb=target_kb, trace=trace,
+                                           crop_half=crop_half)
+
+
+def report_seek(video_path, stats):
+    """Print the seek cost recorded for a poster"""
+    if 'seek_ms' in stats:
+        print(f"{os.path.basename(video_path)}: {poster_extractor.format_seek(stats)}", file=sys.stderr)
+
+
+def generate_theme_id(theme_name):
+    """Generate theme ID from theme name"""
+    theme_id = theme_name.lower()
+    theme_id = re.sub(r'[^a-z0-9\s-]', '', theme_id)
+    theme_id = re.sub(r'\s+', '-', theme_id)
+    theme_id = re.sub(r'-+', '-', theme_id)
+    return theme_id.strip('-')
+
+
+def top_level_keys(head):
+    """Yield the top-level keys of the JSON object that starts in head, as far as head goes
+
+    Strings are matched whole, so braces and keys inside values or nested
+    objects are never mistaken for top-level keys.
+    """
+    depth = 0
+    expect_key = False
+    for match in JSON_TOKEN.finditer(head):
+        token = match.group()
+        if token == b'"':
+            return  # A string cut off at the end of head
+        if token in (b'{', b'['):
+            depth += 1
+            expect_key = token == b'{' and depth == 1
+        elif token in (b'}', b']'):
+            depth -= 1
+            if depth == 0:
+                return
+        elif depth == 1 and token == b',':
+            expect_key = True
+        elif depth == 1 and expect_key and token.startswith(b'"'):
+            expect_key = False
+            try:
+                yield json.loads(token)
+            except ValueError:
+                return
+
+
+def sniff_theme_json(json_path, limit=SNIFF_BYTES):
+    """Tell whether a JSON file is a theme JSON (top-level "theme" and "clips"), parsing it only if needed
+
+    Returns (is_theme, data). The top-level keys in the first `limit`
+    bytes are scanned: with both "theme" and "clips" among them it is a
+    theme JSON, with neither it is not, and nothing is parsed. If only
+    one of them turns up before the scan runs out, the file is loaded to
+    make sure, and the parsed data is returned so it isn't read twice.
+    """
+    try:
+        with open(json_path, 'rb') as f:
+            head = f.read(limit)
+            if not JSON_OBJECT_START.match(head):
+                return False, None
+            found = THEME_JSON_KEYS.intersection(top_level_keys(head))
+            if found == THEME_JSON_KEYS:
+                return True, None
+            if not found:
+                return False, None
+            f.seek(0)
+            data = json.load(f)
+    except (OSError, ValueError):
+        return False, None
+    if isinstance(data, dict) and THEME_JSON_KEYS.issubset(data):
+        return True, data
+    return False, None
+
+
+def file_signature(path):
+    """[size, mtime_ns] of path, or None if it cannot be read"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def read_theme_index(folder):
+    """(theme JSON recorded in folder's index file, whether it is unchanged since), or (None, False)
+
+    A file that still has the size and mtime recorded when it was saved
+    can be trusted without looking inside it.
+    """
+    try:
+        with open(Path(folder) / THEME_INDEX_NAME, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        name = index.get('themeJson')
+    except (OSError, ValueError, AttributeError):
+        return None, False
+    if not isinstance(name, str):
+        return None, False
+    json_path = Path(folder) / name
+    signature = file_signature(json_path)
+    if signature is None:
+        return None, False
+    return json_path, signature == index.get('signature')
+
+
+def write_theme_index(json_path):
+    """Record json_path and its current size and mtime as its folder's theme JSON, for find_existing_json"""
+    index_path = Path(json_path).parent / THEME_INDEX_NAME
+    tmp_path = index_path.with_name(index_path.name + '.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'themeJson': Path(json_path).name,
+                       'signature': file_signature(json_path)}, f)
+        os.replace(tmp_path, index_path)
+    except OSError as e:
+        print(f"Error writing theme index: {e}", file=sys.stderr)
+
+
+def find_existing_theme(folder_path):
+    """Find existing theme JSON file in folder, returning (path, parsed data or None)
+
+    Hidden files (the theme index, poster manifests) are ignored. With
+    several candidates, the file recorded in the index by the last save
+    is used as is if it is unchanged since; otherwise each file is checked
+    with sniff_theme_json, which only parses files that may be the theme.
+    Parsed data comes back so the caller doesn't load the file again.
+    """
+    folder = Path(folder_path)
+    json_files = sorted(path for path in folder.glob('*.json') if not path.name.startswith('.'))
+
+    if len(json_files) == 1:
+        return json_files[0], None
+    elif len(json_files) > 1:
+        # Multiple JSONs - look for one that matches theme structure
+        indexed, unchanged = read_theme_index(folder)
+        if indexed is not None:
+            if unchanged:
+                return indexed, None
+            # Edited since the last save: check it first
+            json_files.remove(indexed)
+            json_files.insert(0, indexed)
+        for json_file in json_files:
+            is_theme, data = sniff_theme_json(json_file)
+            if is_theme:
+                return json_file, data
+    return None, None
+
+
+def find_existing_json(folder_path):
+    """Find existing theme JSON file in folder (see find_existing_theme)"""
+    return find_existing_theme(folder_path)[0]
+
+
+def load_existing_theme_data(json_path):
+    """Load existing theme JSON"""
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            return data.get('theme'), data.get('clips', [])
+    except Exception as e:
+        print(f"Error loading existing JSON: {e}", file=sys.stderr)
+        return None, []
+
+
+def move_xmp_to_trash(video_paths):
+    """Move XMP files to xmp_trash folder"""
+    if not video_paths:
+        return
+
+    try:
+        # Create xmp_trash folder in same directory as videos
+        folder = Path(video_paths[0]).parent
+        trash_folder = folder / 'xmp_trash'
+        trash_folder.mkdir(exist_ok=True)
+
+        moved_count = 0
+        for video_path in video_paths:
+            xmp_path = Path(video_path).with_suffix('.xmp')
+            if xmp_path.exists():
+                trash_path = trash_folder / xmp_path.name
+                # If file already exists in trash, add number
+                counter = 1
+                while trash_path.exists():
+                    trash_path = trash_folder / f"{xmp_path.stem}_{counter}.xmp"
+                    counter += 1
+                xmp_path.rename(trash_path)
+                moved_count += 1
+
+        print(f"Moved {moved_count} XMP files to xmp_trash/", file=sys.stderr)
+    except Exception as e:
+        print(f"Error moving XMP files: {e}", file=sys.stderr)
+
+
+class ClipStore:
+    """Theme clips in insertion order, indexed by id
+
+    Clips loaded from an existing JSON are all kept, even if their ids
+    repeat; add() refuses a clip whose id is already present.
+    """
+
+    def __init__(self, clips=()):
+        self._clips = []
+        self._by_id = {}
+        self._unassigned = []  # Clips still waiting for the theme id ('any')
+        for clip in clips:
+            self._insert(clip)
+
+    def _insert(self, clip):
+        self._clips.append(clip)
+        self._by_id.setdefault(clip.get('id'), clip)
+        if clip.get('themeId') == 'any':
+            self._unassigned.append(clip)
+
+    def __len__(self):
+        return len(self._clips)
+
+    def __iter__(self):
+        return iter(self._clips)
+
+    def __contains__(self, clip_id):
+        return clip_id in self._by_id
+
+    def add(self, clip):
+        """Add a clip, returning False if one with the same id is already stored"""
+        if clip['id'] in self._by_id:
+            return False
+        self._insert(clip)
+        return True
+
+    def assign_theme(self, theme_id):
+        """Give every clip still marked themeId 'any' the real theme id"""
+        for clip in self._unassigned:
+            if clip['themeId'] == 'any':
+                clip['themeId'] = theme_id
+        self._unassigned = []
+
+    def to_list(self):
+        return list(self._clips)
+
+
+def add_timings(timings, stage_timings):
+    """Add per-file stage seconds into a batch timings dict (if given)"""
+    if timings is None:
+        return
+    for stage, seconds in stage_timings.items():
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def read_sidecar(video_path, traced=False):
+    """Stage one of build_theme: parse a video's XMP sidecar and marker
+
+    Returns a dict with 'kind' ('theme', 'clip' or None if the video
+    can't be used), 'config', 'parsed_name' for clips, 'errors' (in the
+    order the serial path reported them), 'timings' and 'trace'.
+    """
+    name = os.path.basename(video_path)
+    trace = poster_trace.Trace(video_path) if traced else None
+    sidecar = {'kind': None, 'errors': [], 'timings': {}, 'trace': trace}
+    timings = sidecar['timings']
+
+    try:
+        # Get XMP path
+        xmp_path = Path(video_path).with_suffix('.xmp')
+
+        if not xmp_path.exists():
+            sidecar['errors'].append(f"{name}: No XMP file found")
+            return sidecar
+
+        # Check if this might be theme-demo by filename
+        is_theme_file = 'theme' in Path(video_path).stem.lower()
+
+        # Parse XMP - look at frame 0 if theme file, frame 1+ otherwise
+        with timed(timings, 'xmp', trace):
+            comp_title, marker_text = parse_xmp_metadata(xmp_path, look_for_theme=is_theme_file)
+
+        if not marker_text:
+            sidecar['errors'].append(f"{name}: No marker data found")
+            return sidecar
+
+        # Parse marker
+        with timed(timings, 'marker', trace):
+            config, marker_errors = marker_grammar.parse_marker(marker_text)
+
+        if not config:
+            sidecar['errors'].append(f"{name}: Could not parse marker")
+            return sidecar
+
+        # Malformed lines were skipped; the rest of the marker still applies
+        for marker_error in marker_errors:
+            sidecar['errors'].append(f"{name}: marker {marker_error}")
+        sidecar['config'] = config
+
+        # Check if this is theme preview
+        if 'themeName' in config:
+            sidecar['kind'] = 'theme'
+        else:
+            # This is a clip
+            parsed_name = parse_comp_name(video_path)
+
+            if not parsed_name:
+                sidecar['errors'].append(f"{name}: Invalid filename format")
+                return sidecar
+
+            sidecar['kind'] = 'clip'
+            sidecar['parsed_name'] = parsed_name
+
+    except Exception as e:
+        sidecar['errors'].append(f"{name}: {str(e)}")
+    return sidecar
+
+
+def render_media(video_path, is_clip, position_percent, quality, output_size, seek_mode,
+                 encoder, target_kb, traced=False):
+    """Stage two of build_theme: poster, and duration for clips, in a worker process
+
+    The video is opened once for both. Returns a dict with 'success',
+    'poster_path' (or the error), 'duration', 'stats' (including the
+    worker's 'pid' and 'peak_rss'), 'timings' and 'trace'.
+    """
+    trace = poster_trace.Trace(video_path) if traced else None
+    timings = {}
+    stats = {}
+    duration = None
+
+    with timed(timings, 'probe', trace):
+        probe = poster_extractor.VideoProbe(video_path, seek_mode)
+    with probe:
+        # Generate poster
+        with timed(timings, 'poster', trace):
+            success, poster_path = extract_poster(video_path, position_percent, quality,
+                                                  output_size, stats=stats, probe=probe,
+                                                  encoder=encoder, target_kb=target_kb,
+                                                  trace=trace)
+
+        # Get duration
+        if is_clip:
+            with timed(timings, 'duration', trace):
+                duration = get_video_duration(video_path, probe=probe)
+
+    stats['pid'] = os.getpid()
+    stats['peak_rss'] = memory_budget.peak_rss()
+    return {'success': success, 'poster_path': poster_path, 'duration': duration,
+            'stats': stats, 'timings': timings, 'trace': trace}
+
+
+def build_theme(video_paths, base_url, position_percent=25, quality=85, output_size=(640, 360),
+                append_mode=False, seek_mode=poster_extractor.SEEK_EXACT,
+                encoder=DEFAULT_ENCODER, target_kb=None,
+                on_status=None, on_progress=None, timings=None, tracer=None, workers=None,
+                json_layout=theme_writer.LAYOUT_PRETTY, shards=False, executor=None, threads=None,
+                governor=None, rss=None):
+    """Generate posters and the theme JSON for a batch of clips in one folder
+
+    Runs as a two-stage pipeline. Stage one reads every XMP sidecar and
+    marker in a thread pool. Stage two renders posters and probes
+    durations in a pool of `workers` processes (default: one per CPU;
+    1 runs everything in this process), or in `executor` if one is given,
+    so several builds can share a pool. threads, a (cv2_threads,
+    decoder_threads) pair, is applied in each worker. The results are then merged in
+    queue order exactly as a serial run would, so the JSON is identical
+    whatever the worker count.
+
+    on_status(text) and on_progress(percent) are called as the batch
+    advances. If a timings dict is given, the seconds spent in each stage
+    (xmp, marker, probe, poster, duration, json_write, xmp_trash) are
+    added to it, summed over files. If a poster_trace.TraceWriter is given
+    as tracer, the same stages, plus the poster's own
+    seek/decode/render/encode/write stages, are written to it per file.
+
+    The JSON is written atomically by theme_writer in json_layout
+    ('pretty' or 'compact'); shards=True also writes one NDJSON file per
+    category under `<theme>.shards/`.
+
+    A memory_budget.MemoryGovernor limits the estimated frame memory of
+    the videos in stage two at once (several builds may share one), and a
+    memory_budget.PeakRSS given as rss records each worker's peak RSS.
+
+    Returns a dict with 'theme', 'clips', 'errors', 'new_clips',
+    'json_path' (None if nothing was written) and 'status'.
+    """
+    def status(text):
+        if on_status:
+            on_status(text)
+
+    base_url = base_url.rstrip('/') + '/'
+    if workers is None:
+        workers = os.cpu_count() or 1
+    traced = tracer is not None
+
+    # Check for existing JSON if in append mode
+    existing_theme = None
+    existing_clips = []
+    existing_json_path = None
+
+    if append_mode and video_paths:
+        folder = Path(video_paths[0]).parent
+        existing_json_path, existing_data = find_existing_theme(folder)
+
+        if existing_json_path:
+            if existing_data is not None:
+                existing_theme, existing_clips = existing_data.get('theme'), existing_data.get('clips', [])
+            else:
+                existing_theme, existing_clips = load_existing_theme_data(existing_json_path)
+            if existing_theme:
+                status(f"Appending to: {existing_json_path.name}")
+            else:
+                status("Existing JSON found but invalid format")
+                append_mode = False
+        else:
+            status("No existing JSON found - creating new theme")
+            append_mode = False
+
+    theme_data = existing_theme
+    clips = ClipStore(existing_clips or [])
+    errors = []
+    new_clips_count = 0
+
+    # Stage one: sidecars and markers, concurrently, results in queue order
+    status(f"Reading markers for {len(video_paths)} videos...")
+    with ThreadPoolExecutor() as readers:
+        sidecars = list(readers.map(lambda video_path: read_sidecar(video_path, traced), video_paths))
+
+    # Posters are only needed for the theme video (unless appending to an
+    # existing theme) and for clips not already in the theme
+    media_jobs = [
+        i for i, sidecar in enumerate(sidecars)
+        if (sidecar['kind'] == 'theme' and not (append_mode and existing_theme))
+        or (sidecar['kind'] == 'clip' and Path(video_paths[i]).stem not in clips)
+    ]
+    # Render the theme video first, so its poster is ready early
+    media_jobs.sort(key=lambda i: sidecars[i]['kind'] != 'theme')
+
+    # Stage two: posters and durations, through the shared extraction engine.
+    # A failed job (or dead worker process) leaves its exception in media.
+    media = {}
+    jobs = ((i, (video_paths[i], sidecars[i]['kind'] == 'clip', position_percent, quality,
+                 output_size, seek_mode, encoder, target_kb, traced))
+            for i in media_jobs)
+    parallel = executor is not None or workers > 1
+    if parallel and media_jobs:
+        status(f"Processing {len(media_jobs)} videos with {workers} workers...")
+    elif media_jobs:
+        status(f"Processing: {os.path.basename(video_paths[media_jobs[0]])}")
+
+    def cost(video_path, *args):
+        return poster_extractor.job_bytes(video_path)
+
+    results = poster_extractor.stream_jobs(render_media, jobs, workers, executor=executor, threads=threads,
+                                           governor=governor, cost=cost)
+    for done, (i, outcome) in enumerate(results, start=1):
+        media[i] = outcome
+        if rss is not None and not isinstance(outcome, Exception):
+            rss.record(outcome['stats'])
+        if parallel:
+            status(f"Processed {done}/{len(media_jobs)}: {os.path.basename(video_paths[i])}")
+        elif done < len(media_jobs):
+            status(f"Processing: {os.path.basename(video_paths[media_jobs[done]])}")
+        if on_progress:
+            on_progress(done / len(media_jobs) * 100)
+
+    # Merge in queue order, exactly as the serial loop did
+    for i, video_path in enumerate(video_paths):
+        sidecar = sidecars[i]
+        trace = sidecar['trace']
+        add_timings(timings, sidecar['timings'])
+        errors.extend(sidecar['errors'])
+
+        try:
+            kind = sidecar['kind']
+            if kind is None:
+                continue
+            config = sidecar['config']
+
+            if kind == 'theme' and append_mode and existing_theme:
+                # Skip theme processing in append mode
+                status("Skipping theme video (using existing theme data)")
+                continue
+
+            # Check if clip already exists (by id)
+            clip_id = Path(video_path).stem
+            if kind == 'clip' and clip_id in clips:
+                status(f"Skipping {clip_id} (already exists)")
+                continue
+
+            rendered = media[i]
+            if isinstance(rendered, Exception):
+                raise rendered
+            add_timings(timings, rendered['timings'])
+            if trace is not None and rendered['trace'] is not None:
+                trace.spans.extend(rendered['trace'].spans)
+            report_seek(video_path, rendered['stats'])
+            success = rendered['success']
+            poster_path = rendered['poster_path']
+
+            if kind == 'theme':
+                theme_name = config['themeName']
+                theme_id = generate_theme_id(theme_name)
+
+                theme_data = {
+                    'id': theme_id,
+                    'name': theme_name,
+                    'description': config.get('themeDescription', ''),
+                    'previewUrl': base_url + os.path.basename(video_path),
+                    'posterUrl': base_url + os.path.basename(poster_path) if success else ''
+                }
+            else:
+                if not success:
+                    errors.append(f"{os.path.basename(video_path)}: {poster_path}")
+                    continue
+
+                parsed_name = sidecar['parsed_name']
+
+                # Get theme ID (from existing or new theme data)
+                theme_id = theme_data['id'] if theme_data else 'any'
+
+                # Build clip object
+                clip = {
+                    'id': clip_id,
+                    'title': parsed_name['title'],
+                    'category': parsed_name['category'],
+                    'categoryOrder': parsed_name['categoryOrder'],
+                    'previewUrl': base_url + os.path.basename(video_path),
+                    'posterUrl': base_url + os.path.basename(poster_path),
+                    'themeId': theme_id,
+                    'defaultDuration': rendered['duration'],
+                    'isOverlay': config.get('isOverlay', False),
+                    'tierRequirement': config.get('tierRequirement', 'Essential'),
+                    'triggersTierUpgrade': False,
+                    'requiresInput': config.get('requiresInput', len(config['customInputs']) > 0),
+                    'popupMessage': config.get('popupMessage', ''),
+                    'customInputs': config['customInputs']
+                }
+
+                clips.add(clip)
+                new_clips_count += 1
+
+        except Exception as e:
+            errors.append(f"{os.path.basename(video_path)}: {str(e)}")
+        finally:
+            if tracer is not None:
+                tracer.write(trace)
+
+    if on_progress:
+        on_progress(100)
+
+    result = {
+        'theme': theme_data,
+        'clips': clips.to_list(),
+        'errors': errors,
+        'new_clips': new_clips_count,
+        'json_path': None,
+        'status': None,
+    }
+
+    # Build final JSON
+    if theme_data and clips:
+        # Update clip themeIds if needed
+        theme_id = theme_data['id']
+        clips.assign_theme(theme_id)
+
+        # Save JSON (overwrite existing if in append mode)
+        output_dir = Path(video_paths[0]).parent
+
+        if append_mode and existing_json_path:
+            json_path = existing_json_path
+            status_msg = f"Updated: Added {new_clips_count} new clips (total: {len(clips)})"
+        else:
+            json_path = output_dir / f"{theme_id}.json"
+            status_msg = f"Complete: Generated {len(clips)} clips + theme JSON"
+
+        trace = poster_trace.Trace(json_path) if tracer is not None else None
+        with timed(timings, 'json_write', trace):
+            theme_writer.write_theme_json(json_path, theme_data, result['clips'], json_layout, shards)
+            write_theme_index(json_path)
+
+        # Move XMP files to trash folder
+        with timed(timings, 'xmp_trash', trace):
+            move_xmp_to_trash(video_paths)
+        if tracer is not None:
+            tracer.write(trace)
+
+        status(status_msg)
+        result['json_path'] = json_path
+        result['status'] = status_msg
+
+    return result
+
+
+def group_by_folder(video_paths):
+    """Split video paths into {folder: paths}, keeping queue order within and across folders"""
+    groups = {}
+    for video_path in video_paths:
+        groups.setdefault(Path(video_path).parent, []).append(video_path)
+    return groups
+
+
+def build_themes(video_paths, base_url, position_percent=25, quality=85, output_size=(640, 360),
+                 on_status=None, on_progress=None, timings=None, workers=None, **options):
+    """Run build_theme once per folder in the queue, folders concurrently
+
+    Each folder is an independent theme, with its own JSON, append-mode
+    lookup and xmp_trash folder. A `{folder}` placeholder in base_url is
+    replaced by each folder's name. The folders share one pool of
+    `workers` processes for posters; with workers=1 they are built one
+    after another in this process.
+
+    on_status(folder, text) and on_progress(folder, percent) report each
+    theme separately. Remaining keyword options are passed to build_theme;
+    a governor and rss given there are shared by all the folders.
+    Returns {folder: build_theme result}, in queue order; a folder whose
+    build failed gets a result with the exception in its errors.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    groups = group_by_folder(video_paths)
+
+    def build(folder, folder_timings, executor):
+        return build_theme(
+            groups[folder], base_url.replace('{folder}', folder.name), position_percent, quality,
+            output_size,
+            on_status=(lambda text: on_status(folder, text)) if on_status else None,
+            on_progress=(lambda percent: on_progress(folder, percent)) if on_progress else None,
+            timings=folder_timings, workers=workers, executor=executor, **options)
+
+    # Separate timings per folder, since the builds run in parallel threads
+    folder_timings = {folder: ({} if timings is not None else None) for folder in groups}
+    results = {}
+    if workers <= 1 or len(groups) == 1:
+        for folder in groups:
+            try:
+                results[folder] = build(folder, folder_timings[folder], None)
+            except Exception as e:
+                results[folder] = failed_build(folder, e)
+    else:
+        with poster_extractor.worker_pool(workers, options.get('threads')) as pool, \
+                ThreadPoolExecutor(max_workers=len(groups)) as threads:
+            futures = {folder: threads.submit(build, folder, folder_timings[folder], pool) for folder in groups}
+            for folder, future in futures.items():
+                try:
+                    results[folder] = future.result()
+                except Exception as e:
+                    results[folder] = failed_build(folder, e)
+
+    for stage_timings in folder_timings.values():
+        add_timings(timings, stage_timings or {})
+    return results
+
+
+def failed_build(folder, error):
+    """A build_theme-shaped result for a folder whose build raised"""
+    return {'theme': None, 'clips': [], 'errors': [f"{folder.name}: {error}"], 'new_clips': 0,
+            'json_path': None, 'status': None}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate posters and theme JSONs for exported clips without a GUI.")
+    parser.add_argument('paths', nargs='+',
+                        help="MP4 files and/or folders; each folder becomes its own theme")
+    parser.add_argument('-b', '--base-url', default='./assets/media/',
+                        help="URL prefix for previewUrl/posterUrl; {folder} is replaced by the "
+                             "folder name (default: ./assets/media/)")
+    parser.add_argument('-a', '--append', action='store_true',
+                        help="append new clips to the theme JSON already in each folder")
+    parser.add_argument('-p', '--position', type=poster_extractor.parse_position, default=25.0,
+                        help="frame position as a percentage of the video (default: 25)")
+    parser.add_argument('-q', '--quality', type=poster_extractor.parse_quality, default=85,
+                        help="quality 1-100 (default: 85)")
+    parser.add_argument('--format', dest='encoder', choices=list(ENCODERS), default=DEFAULT_ENCODER,
+                        help="poster format/encoder (default: jpeg)")
+    parser.add_argument('--target-kb', type=poster_extractor.parse_target_kb, default=None,
+                        help="search for the highest quality that keeps each poster under this many KB")
+    parser.add_argument('-s', '--size', type=poster_extractor.parse_size, default=(640, 360),
+                        help="poster size as WIDTHxHEIGHT (default: 640x360)")
+    parser.add_argument('--seek', choices=poster_extractor.SEEK_MODES, default=poster_extractor.SEEK_EXACT,
+                        help="seek strategy: 'exact' frame or nearest 'keyframe' (default: exact)")
+    parser.add_argument('-w', '--workers', type=poster_extractor.parse_positive_int, default=None,
+                        help="number of parallel poster worker processes (default: the auto-tuned count, "
+                             "else one per CPU)")
+    parser.add_argument('--memory-budget', metavar='SIZE', type=poster_extractor.parse_memory_budget,
+                        default=None,
+                        help="most estimated frame memory in flight across workers, e.g. 8G; larger videos "
+                             "wait for earlier ones to finish (default: half the RAM with several workers, "
+                             "0 for no limit)")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="search folders recursively")
+    parser.add_argument('--layout', choices=theme_writer.LAYOUTS, default=theme_writer.LAYOUT_PRETTY,
+                        help="theme JSON layout (default: pretty)")
+    parser.add_argument('--shards', action='store_true',
+                        help="also write one NDJSON file per category under <theme>.shards/")
+    parser.add_argument('--trace', metavar='FILE', default=None,
+                        help="append per-stage timings to FILE as JSON Lines and print a summary")
+    poster_extractor.add_watch_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    watch_dirs = [path for path in args.paths if Path(path).is_dir()]
+    if args.watch and not watch_dirs:
+        print("--watch needs at least one folder", file=sys.stderr)
+        return 2
+    # Snapshot the folders before listing them, so exports that land while
+    # the initial run is going are picked up by the watcher
+    watcher = None
+    if args.watch:
+        watcher = FolderWatcher(watch_dirs, recursive=args.recursive, settle_seconds=args.settle,
+                                require_xmp=not args.no_xmp)
+
+    videos = poster_extractor.find_videos(args.paths, recursive=args.recursive)
+    if not videos and not args.watch:
+        print("No MP4 files found", file=sys.stderr)
+        return 1
+
+    try:
+        get_encoder(args.encoder)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    # Reuse the worker and thread settings saved by auto_tune for this machine
+    tuning = auto_tune.load_tuning()
+    if args.workers is None:
+        args.workers = tuning['workers'] if tuning else os.cpu_count() or 1
+    threads = auto_tune.tuned_threads(tuning, args.workers)
+
+    tracer = poster_trace.TraceWriter(args.trace) if args.trace else None
+    failed = 0
+
+    def run(batch, append_mode):
+        """Build the themes for batch, printing one line per folder; returns {folder: result}"""
+        nonlocal failed
+        # One budget across all folders, since they share the worker pool
+        governor = poster_extractor.memory_governor(args.memory_budget, args.workers)
+        rss = memory_budget.PeakRSS()
+        results = build_themes(
+            batch, args.base_url, args.position, args.quality, args.size,
+            on_status=lambda folder, text: print(f"{folder.name}: {text}", file=sys.stderr, flush=True),
+            workers=args.workers, append_mode=append_mode, seek_mode=args.seek, encoder=args.encoder,
+            target_kb=args.target_kb, tracer=tracer, json_layout=args.layout, shards=args.shards,
+            threads=threads, governor=governor, rss=rss)
+        print(rss.format(governor), file=sys.stderr, flush=True)
+        for folder, result in results.items():
+            for error in result['errors']:
+                print(f"ERROR\t{folder}\t{error}", flush=True)
+            if result['json_path']:
+                print(f"OK\t{folder}\t{result['json_path']}\t{result['status']}", flush=True)
+            else:
+                failed += 1
+                reason = "no theme data found" if not result['theme'] else "no valid clips processed"
+                print(f"FAIL\t{folder}\t{reason}", flush=True)
+        return results
+
+    def handle_batch(batch):
+        # New arrivals are appended to each folder's theme. Clips that arrive
+        # before their theme video are retried once a theme JSON exists.
+        results = run(batch, append_mode=True)
+        for folder, paths in group_by_folder(batch).items():
+            if results[folder]['json_path']:
+                watcher.wake(folder)
+            else:
+                watcher.retry(paths)
+
+    try:
+        results = run(videos, args.append) if videos else {}
+        if watcher is not None:
+            for folder, paths in group_by_folder(videos).items():
+                if not results[folder]['json_path']:
+                    watcher.retry(paths)
+            print(f"Watching {', '.join(watch_dirs)} for new MP4 + XMP exports (Ctrl+C to stop)",
+                  file=sys.stderr, flush=True)
+            watch(watcher, handle_batch, interval=args.interval, batch_size=args.batch_size)
+    finally:
+        if tracer is not None:
+            tracer.close()
+
+    if tracer is not None and tracer.spans:
+        print(poster_trace.format_summary(poster_trace.summarize(tracer.spans)), file=sys.stderr)
+    return 0 if not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
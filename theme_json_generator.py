@@ -1,14 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinterdnd2 import DND_FILES, TkinterDnD
-import cv2
-from PIL import Image
 import os
-import json
-import re
-from pathlib import Path
 import threading
-import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import auto_tune
+import memory_budget
+import poster_extractor
+import poster_trace
+import theme_builder
+import theme_writer
+from poster_encoders import DEFAULT_ENCODER, available_encoders
+from ui_updates import UIUpdates
+from video_queue import VideoQueue, index_ranges
 
 
 class ThemeJSONGenerator:
@@ -18,11 +23,17 @@ class ThemeJSONGenerator:
         self.root.geometry("900x700")
         
         # Video queue
-        self.video_queue = []
+        self.video_queue = VideoQueue()
+        
+        # Progress percent per theme folder during a batch
+        self.theme_progress = {}
         
         # Create GUI
         self.create_widgets()
         
+        # Worker threads post widget updates here; the main loop applies them
+        self.ui = UIUpdates(root)
+        
     def create_widgets(self):
         # Main container
         main_frame = ttk.Frame(self.root, padding="10")
@@ -49,7 +60,7 @@ class ThemeJSONGenerator:
         self.base_url_var = tk.StringVar(value="./assets/media/")
         url_entry = ttk.Entry(settings_frame, textvariable=self.base_url_var)
         url_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 10))
-        ttk.Label(settings_frame, text="(e.g., ./assets/media/theme-name/)").grid(row=0, column=2, sticky=tk.W)
+        ttk.Label(settings_frame, text="(e.g., ./assets/media/theme-name/ or ./assets/media/{folder}/)").grid(row=0, column=2, sticky=tk.W)
         
         # Frame position setting
         ttk.Label(settings_frame, text="Poster Frame Position (%):").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
@@ -64,8 +75,8 @@ class ThemeJSONGenerator:
         position_entry = ttk.Entry(position_frame, textvariable=self.position_var, width=6)
         position_entry.grid(row=0, column=1, padx=(5, 0))
         
-        # JPEG Quality presets
-        ttk.Label(settings_frame, text="JPEG Quality:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        # Quality presets
+        ttk.Label(settings_frame, text="Poster Quality:").grid(row=2, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
         self.quality_var = tk.IntVar(value=85)
         self.quality_preset_var = tk.StringVar(value="high")
         
@@ -111,11 +122,65 @@ class ThemeJSONGenerator:
         ttk.Entry(size_frame, textvariable=self.height_var, width=8).grid(row=0, column=3, padx=(5, 0))
         ttk.Label(size_frame, text="(default 640x360)").grid(row=0, column=4, padx=(10, 0))
         
+        # Seek mode
+        ttk.Label(settings_frame, text="Seek Mode:").grid(row=4, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        seek_frame = ttk.Frame(settings_frame)
+        seek_frame.grid(row=4, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.seek_mode_var = tk.StringVar(value=poster_extractor.SEEK_EXACT)
+        ttk.Radiobutton(seek_frame, text="Exact frame", variable=self.seek_mode_var,
+                       value=poster_extractor.SEEK_EXACT).grid(row=0, column=0, padx=(0, 10))
+        ttk.Radiobutton(seek_frame, text="Nearest keyframe (faster)", variable=self.seek_mode_var,
+                       value=poster_extractor.SEEK_KEYFRAME).grid(row=0, column=1)
+        
+        # Poster format
+        ttk.Label(settings_frame, text="Poster Format:").grid(row=5, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        format_frame = ttk.Frame(settings_frame)
+        format_frame.grid(row=5, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.encoder_var = tk.StringVar(value=DEFAULT_ENCODER)
+        ttk.Combobox(format_frame, textvariable=self.encoder_var, values=available_encoders(),
+                    state='readonly', width=18).grid(row=0, column=0)
+        ttk.Label(format_frame, text="Target size (KB):").grid(row=0, column=1, padx=(10, 0))
+        self.target_kb_var = tk.StringVar()
+        ttk.Entry(format_frame, textvariable=self.target_kb_var, width=8).grid(row=0, column=2, padx=(5, 0))
+        ttk.Label(format_frame, text="(optional - overrides quality)").grid(row=0, column=3, padx=(10, 0))
+        
         # Append mode checkbox
         self.append_mode_var = tk.BooleanVar(value=False)
         append_check = ttk.Checkbutton(settings_frame, text="Append to existing theme JSON (auto-detects in folder)",
                                       variable=self.append_mode_var)
-        append_check.grid(row=4, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        append_check.grid(row=6, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # Parallel workers
+        ttk.Label(settings_frame, text="Parallel Workers:").grid(row=7, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        workers_frame = ttk.Frame(settings_frame)
+        workers_frame.grid(row=7, column=1, sticky=tk.W, pady=(10, 0))
+        
+        # Start from the setting auto_tune saved for this machine, if any
+        tuning = auto_tune.load_tuning()
+        self.workers_var = tk.IntVar(value=tuning['workers'] if tuning else os.cpu_count() or 1)
+        ttk.Spinbox(workers_frame, from_=1, to=64, textvariable=self.workers_var, width=6).grid(row=0, column=0)
+        self.auto_tune_button = ttk.Button(workers_frame, text="Auto-tune", command=self.auto_tune_workers)
+        self.auto_tune_button.grid(row=0, column=1, padx=(10, 0))
+        ttk.Label(workers_frame, text="(posters are rendered in parallel; 1 = one file at a time)").grid(row=0, column=2, padx=(10, 0))
+        
+        # Stage tracing
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text=f"Write per-stage timings to {poster_trace.TRACE_NAME} (for diagnosing slow batches)",
+                       variable=self.trace_var).grid(row=8, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
+        # JSON layout and optional per-category shards
+        ttk.Label(settings_frame, text="JSON Layout:").grid(row=9, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        layout_frame = ttk.Frame(settings_frame)
+        layout_frame.grid(row=9, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.json_layout_var = tk.StringVar(value=theme_writer.LAYOUT_PRETTY)
+        ttk.Combobox(layout_frame, textvariable=self.json_layout_var, values=theme_writer.LAYOUTS,
+                    state='readonly', width=10).grid(row=0, column=0)
+        self.shards_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(layout_frame, text="Also write NDJSON shards per category",
+                       variable=self.shards_var).grid(row=0, column=1, padx=(10, 0))
         
         # Drop Zone Frame
         drop_frame = ttk.LabelFrame(main_frame, text="Drop Video Files Here or Click to Browse", padding="10")
@@ -161,6 +226,10 @@ class ThemeJSONGenerator:
         self.status_label = ttk.Label(progress_frame, text="Ready")
         self.status_label.grid(row=1, column=0, sticky=tk.W, pady=(5, 0))
         
+        # Per-theme progress when the queue spans several folders
+        self.themes_label = ttk.Label(progress_frame, text="")
+        self.themes_label.grid(row=2, column=0, sticky=tk.W)
+        
         # Process Button
         button_row = ttk.Frame(main_frame)
         button_row.grid(row=5, column=0)
@@ -185,11 +254,10 @@ class ThemeJSONGenerator:
             self.add_files(files)
             
     def add_files(self, files):
-        for file in files:
-            file = file.strip('{}')
-            if file.lower().endswith('.mp4') and file not in self.video_queue:
-                self.video_queue.append(file)
-                self.video_listbox.insert(tk.END, os.path.basename(file))
+        files = [file.strip('{}') for file in files]
+        added = self.video_queue.add_many(file for file in files if file.lower().endswith('.mp4'))
+        if added:
+            self.video_listbox.insert(tk.END, *[os.path.basename(file) for file in added])
                 
     def clear_queue(self):
         self.video_queue.clear()
@@ -197,9 +265,9 @@ class ThemeJSONGenerator:
         
     def remove_selected(self):
         selected = self.video_listbox.curselection()
-        for index in reversed(selected):
-            self.video_queue.pop(index)
-            self.video_listbox.delete(index)
+        self.video_queue.remove_indices(selected)
+        for first, last in index_ranges(selected):
+            self.video_listbox.delete(first, last)
     
     def set_quality_preset(self, quality_value):
         """Set quality to preset value"""
@@ -213,355 +281,43 @@ class ThemeJSONGenerator:
     
     def parse_comp_name(self, filename):
         """Parse composition name from filename"""
-        name = Path(filename).stem
-        parts = name.split('-')
-        
-        if len(parts) < 3:
-            return None
-        
-        # Find the first part that's a valid number (the order)
-        order_index = None
-        order_num = None
-        
-        for i, part in enumerate(parts):
-            try:
-                order_num = int(part)
-                order_index = i
-                break
-            except ValueError:
-                continue
-        
-        if order_index is None or order_index == 0:
-            return None
-        
-        # Everything before the number is the category
-        category = '-'.join(parts[:order_index])
-        # Everything after the number is the title
-        title = '-'.join(parts[order_index + 1:])
-        
-        if not title:
-            return None
-        
-        return {
-            'category': category,
-            'categoryOrder': order_num,
-            'title': title.replace('-', ' ').title()
-        }
+        return theme_builder.parse_comp_name(filename)
     
     def parse_xmp_metadata(self, xmp_path, look_for_theme=False):
-        """Extract marker data from XMP file
-        
-        Args:
-            xmp_path: Path to XMP file
-            look_for_theme: If True, only look at frame 0 markers. If False, look at frame 1+ markers.
-        """
-        try:
-            tree = ET.parse(xmp_path)
-            root = tree.getroot()
-            
-            # Namespaces
-            namespaces = {
-                'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
-                'xmpDM': 'http://ns.adobe.com/xmp/1.0/DynamicMedia/',
-                'dc': 'http://purl.org/dc/elements/1.1/'
-            }
-            
-            # Extract composition title
-            comp_title = None
-            for title_elem in root.findall('.//dc:title/rdf:Alt/rdf:li', namespaces):
-                comp_title = title_elem.text
-                break
-            
-            # Extract marker comment based on frame position
-            marker_comment = None
-            for marker in root.findall('.//xmpDM:markers/rdf:Seq/rdf:li', namespaces):
-                start_time_elem = marker.find('xmpDM:startTime', namespaces)
-                comment_elem = marker.find('xmpDM:comment', namespaces)
-                
-                if start_time_elem is not None and comment_elem is not None:
-                    start_time = int(start_time_elem.text)
-                    
-                    # Frame 0 for theme, Frame 1+ for clips
-                    if look_for_theme and start_time == 0:
-                        marker_comment = comment_elem.text
-                        break
-                    elif not look_for_theme and start_time > 0:
-                        marker_comment = comment_elem.text
-                        break
-            
-            return comp_title, marker_comment
-            
-        except Exception as e:
-            print(f"Error parsing XMP: {e}")
-            return None, None
+        """Extract marker data from XMP file"""
+        return theme_builder.parse_xmp_metadata(xmp_path, look_for_theme)
     
     def parse_simplified_marker(self, marker_text):
         """Parse simplified marker syntax into JSON structure"""
-        if not marker_text:
-            return None
-            
-        config = {
-            'customInputs': []
-        }
-        
-        # Split on both \n and \r to handle different line endings
-        lines = re.split(r'[\r\n]+', marker_text.strip())
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.startswith('DESCRIPTION:'):
-                config['popupMessage'] = line[12:].strip()
-                
-            elif line.startswith('THEME-NAME:'):
-                config['themeName'] = line[11:].strip()
-                
-            elif line.startswith('THEME-DESCRIPTION:'):
-                config['themeDescription'] = line[18:].strip()
-                
-            elif line.startswith('TEXT:'):
-                parts = [p.strip() for p in line[5:].split('|')]
-                if len(parts) >= 3:
-                    input_def = {
-                        'inputType': 'text',
-                        'label': parts[0],
-                        'fieldId': parts[1],
-                        'maxLength': int(parts[2])
-                    }
-                    if len(parts) > 3 and parts[3]:
-                        input_def['placeholder'] = parts[3]
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('TEXTAREA:'):
-                parts = [p.strip() for p in line[9:].split('|')]
-                if len(parts) >= 3:
-                    input_def = {
-                        'inputType': 'textarea',
-                        'label': parts[0],
-                        'fieldId': parts[1],
-                        'maxLength': int(parts[2])
-                    }
-                    if len(parts) > 3 and parts[3]:
-                        input_def['placeholder'] = parts[3]
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('URL:'):
-                parts = [p.strip() for p in line[4:].split('|')]
-                if len(parts) >= 2:
-                    input_def = {
-                        'inputType': 'url',
-                        'label': parts[0],
-                        'fieldId': parts[1]
-                    }
-                    if len(parts) > 2 and parts[2]:
-                        input_def['placeholder'] = parts[2]
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('TEXTLIST-FIXED:'):
-                parts = [p.strip() for p in line[15:].split('|')]
-                if len(parts) >= 4:
-                    input_def = {
-                        'inputType': 'textList',
-                        'label': parts[0],
-                        'fieldId': parts[1],
-                        'count': int(parts[2]),
-                        'itemMaxLength': int(parts[3])
-                    }
-                    if len(parts) > 4 and parts[4]:
-                        input_def['placeholder'] = parts[4]
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('TEXTLIST-FLEX:'):
-                parts = [p.strip() for p in line[14:].split('|')]
-                if len(parts) >= 4:
-                    min_max = parts[2].split('-')
-                    input_def = {
-                        'inputType': 'textList',
-                        'label': parts[0],
-                        'fieldId': parts[1],
-                        'minItems': int(min_max[0]),
-                        'maxItems': int(min_max[1]),
-                        'itemMaxLength': int(parts[3])
-                    }
-                    if len(parts) > 4 and parts[4]:
-                        input_def['placeholder'] = parts[4]
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('MEDIA-FIXED:'):
-                parts = [p.strip() for p in line[12:].split('|')]
-                if len(parts) >= 5:
-                    input_def = {
-                        'inputType': 'mediaRequestList',
-                        'label': parts[0],
-                        'fieldId': parts[1],
-                        'mediaType': parts[2],
-                        'count': int(parts[3]),
-                        'description': parts[4]
-                    }
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('MEDIA-FLEX:'):
-                parts = [p.strip() for p in line[11:].split('|')]
-                if len(parts) >= 5:
-                    min_max = parts[3].split('-')
-                    input_def = {
-                        'inputType': 'mediaRequestList',
-                        'label': parts[0],
-                        'fieldId': parts[1],
-                        'mediaType': parts[2],
-                        'minItems': int(min_max[0]),
-                        'maxItems': int(min_max[1]),
-                        'description': parts[4]
-                    }
-                    config['customInputs'].append(input_def)
-                    
-            elif line.startswith('NO-INPUT:'):
-                config['requiresInput'] = False
-                
-            elif line.startswith('OVERLAY:'):
-                config['isOverlay'] = True
-                
-            elif line.startswith('TIER:'):
-                config['tierRequirement'] = line[5:].strip()
-        
-        return config
+        return theme_builder.parse_simplified_marker(marker_text)
     
-    def get_video_duration(self, video_path):
+    def get_video_duration(self, video_path, probe=None):
         """Get video duration in seconds"""
-        try:
-            cap = cv2.VideoCapture(video_path)
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            cap.release()
-            
-            if fps > 0:
-                duration = frame_count / fps
-                return round(duration, 2)
-            return 3
-        except Exception as e:
-            print(f"Error getting duration: {e}")
-            return 3
+        return theme_builder.get_video_duration(video_path, probe)
     
     def is_split_screen(self, width, height):
         """Detect if video is split-screen format"""
-        ratio = width / height if height > 0 else 0
-        return ratio >= 1.8
+        return poster_extractor.is_split_screen(width, height)
         
-    def extract_poster(self, video_path, position_percent, quality, output_size=None):
+    def extract_poster(self, video_path, position_percent, quality, output_size=None, **options):
         """Extract poster frame from video"""
-        try:
-            cap = cv2.VideoCapture(video_path)
-            
-            if not cap.isOpened():
-                return False, "Could not open video file"
-                
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            if total_frames <= 0 or fps <= 0:
-                cap.release()
-                return False, "Invalid video properties"
-            
-            frame_number = int((position_percent / 100.0) * total_frames)
-            frame_number = max(0, min(frame_number, total_frames - 1))
-                
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret:
-                return False, "Could not read frame"
-                
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            height, width = frame.shape[:2]
-            
-            # Check if this is an overlay file or split-screen
-            filename = Path(video_path).stem
-            if filename.startswith('overlay') or self.is_split_screen(width, height):
-                frame = frame[:, :width//2]
-                
-            img = Image.fromarray(frame)
-            
-            # Resize if output size specified
-            if output_size:
-                img = img.resize(output_size, Image.LANCZOS)
-            
-            path = Path(video_path)
-            output_path = path.parent / f"{path.stem}-poster.jpg"
-            
-            img.save(output_path, 'JPEG', quality=quality)
-            
-            return True, str(output_path)
-            
-        except Exception as e:
-            return False, str(e)
+        return theme_builder.extract_poster(video_path, position_percent, quality, output_size, **options)
     
     def generate_theme_id(self, theme_name):
         """Generate theme ID from theme name"""
-        theme_id = theme_name.lower()
-        theme_id = re.sub(r'[^a-z0-9\s-]', '', theme_id)
-        theme_id = re.sub(r'\s+', '-', theme_id)
-        theme_id = re.sub(r'-+', '-', theme_id)
-        return theme_id.strip('-')
+        return theme_builder.generate_theme_id(theme_name)
     
     def find_existing_json(self, folder_path):
         """Find existing theme JSON file in folder"""
-        folder = Path(folder_path)
-        json_files = list(folder.glob('*.json'))
-        
-        if len(json_files) == 1:
-            return json_files[0]
-        elif len(json_files) > 1:
-            # Multiple JSONs - look for one that matches theme structure
-            for json_file in json_files:
-                try:
-                    with open(json_file, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                        if 'theme' in data and 'clips' in data:
-                            return json_file
-                except:
-                    continue
-        return None
+        return theme_builder.find_existing_json(folder_path)
     
     def load_existing_theme_data(self, json_path):
         """Load existing theme JSON"""
-        try:
-            with open(json_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                return data.get('theme'), data.get('clips', [])
-        except Exception as e:
-            print(f"Error loading existing JSON: {e}")
-            return None, []
+        return theme_builder.load_existing_theme_data(json_path)
     
     def move_xmp_to_trash(self, video_paths):
         """Move XMP files to xmp_trash folder"""
-        if not video_paths:
-            return
-        
-        try:
-            # Create xmp_trash folder in same directory as videos
-            folder = Path(video_paths[0]).parent
-            trash_folder = folder / 'xmp_trash'
-            trash_folder.mkdir(exist_ok=True)
-            
-            moved_count = 0
-            for video_path in video_paths:
-                xmp_path = Path(video_path).with_suffix('.xmp')
-                if xmp_path.exists():
-                    trash_path = trash_folder / xmp_path.name
-                    # If file already exists in trash, add number
-                    counter = 1
-                    while trash_path.exists():
-                        trash_path = trash_folder / f"{xmp_path.stem}_{counter}.xmp"
-                        counter += 1
-                    xmp_path.rename(trash_path)
-                    moved_count += 1
-            
-            print(f"Moved {moved_count} XMP files to xmp_trash/")
-        except Exception as e:
-            print(f"Error moving XMP files: {e}")
+        theme_builder.move_xmp_to_trash(video_paths)
     
     def show_help(self):
         """Show help documentation window"""
@@ -687,6 +443,13 @@ ADDING CLIPS TO EXISTING THEME:
 3. Click "Generate Theme JSON & Posters"
 4. Tool finds existing JSON and adds new clips
 
+SEVERAL THEMES AT ONCE:
+1. Drag MP4 files from several theme folders
+2. Use {folder} in the Base URL Path for each folder's name
+   (e.g., ./assets/media/{folder}/)
+3. Each folder becomes its own theme JSON and xmp_trash/,
+   processed in parallel with progress shown per theme
+
 ═══════════════════════════════════════════════════════════════════
 
 6. WHAT THE TOOL DOES
@@ -694,7 +457,7 @@ ADDING CLIPS TO EXISTING THEME:
 ✓ Reads XMP metadata from sidecar files
 ✓ Parses simplified marker syntax
 ✓ Extracts video duration automatically
-✓ Generates poster JPEGs (640x360 by default)
+✓ Generates poster images (640x360 JPEG by default; WebP/AVIF optional)
 ✓ Builds complete theme JSON
 ✓ Saves everything to same folder
 ✓ Moves XMP files to xmp_trash/ folder
@@ -728,23 +491,113 @@ For full documentation, see:
         # Close button
         ttk.Button(help_window, text="Close", command=help_window.destroy).grid(row=1, column=0, pady=10)
     
-    def process_videos(self):
+    def set_status(self, text):
+        """Show text in the status line (safe to call from the worker thread)"""
+        self.ui.set('status', self.status_label.config, text=text)
+        
+    def set_progress(self, percent):
+        """Move the progress bar (safe to call from the worker thread)"""
+        self.ui.set('progress', self.progress_var.set, percent)
+        
+    def set_theme_status(self, folder, text):
+        """Status line for one theme of a multi-folder batch"""
+        if len(self.theme_progress) > 1:
+            text = f"{folder.name}: {text}"
+        self.set_status(text)
+        
+    def set_theme_progress(self, folder, percent):
+        """Record one theme's progress; the bar shows the average over themes"""
+        self.theme_progress[folder] = percent
+        self.set_progress(sum(self.theme_progress.values()) / len(self.theme_progress))
+        if len(self.theme_progress) > 1:
+            summary = "   ".join(f"{f.name}: {p:.0f}%" for f, p in self.theme_progress.items())
+            self.ui.set('themes', self.themes_label.config, text=summary)
+        
+    def report_result(self, result):
+        """Show the outcome of a single-folder batch"""
+        errors = result['errors']
+        if result['json_path']:
+            status_msg = result['status']
+            
+            if errors:
+                error_msg = "\n".join(errors[:5])
+                if len(errors) > 5:
+                    error_msg += f"\n... and {len(errors) - 5} more errors"
+                self.ui.call(messagebox.showwarning, "Processing Complete with Errors", 
+                             f"{status_msg}\n\nXMP files moved to xmp_trash/\n\nErrors:\n{error_msg}")
+                
+            else:
+                self.ui.call(messagebox.showinfo, "Success", 
+                             f"{status_msg}\n\nXMP files moved to xmp_trash/\n\nSaved to: {result['json_path'].name}")
+                
+        else:
+            if not result['theme']:
+                self.ui.call(messagebox.showerror, "Error", "No theme data found. Make sure theme exists or add theme preview video with THEME-NAME marker.")
+            elif not result['clips']:
+                self.ui.call(messagebox.showerror, "Error", "No valid clips processed.")
+        
+    def report_results(self, results):
+        """Show the outcome of a multi-folder batch, one line per theme"""
+        lines = []
+        errors = []
+        for folder, result in results.items():
+            if result['json_path']:
+                lines.append(f"{folder.name}: {result['status']} ({result['json_path'].name})")
+            elif not result['theme']:
+                lines.append(f"{folder.name}: No theme data found")
+            else:
+                lines.append(f"{folder.name}: No valid clips processed")
+            errors.extend(result['errors'])
+        
+        summary = "\n".join(lines)
+        saved = sum(1 for result in results.values() if result['json_path'])
+        if errors:
+            error_msg = "\n".join(errors[:5])
+            if len(errors) > 5:
+                error_msg += f"\n... and {len(errors) - 5} more errors"
+            self.ui.call(messagebox.showwarning, "Processing Complete with Errors",
+                         f"{saved}/{len(results)} themes saved\n\n{summary}\n\nErrors:\n{error_msg}")
+        elif saved < len(results):
+            self.ui.call(messagebox.showwarning, "Processing Complete",
+                         f"{saved}/{len(results)} themes saved\n\n{summary}")
+        else:
+            self.ui.call(messagebox.showinfo, "Success",
+                         f"{saved} themes saved\n\n{summary}\n\nXMP files moved to each folder's xmp_trash/")
+        
+    def set_busy(self, busy):
+        """Disable Generate and Auto-tune while a batch or a calibration runs, so only one runs at a time"""
+        state = 'disabled' if busy else 'normal'
+        self.process_button.config(state=state)
+        self.auto_tune_button.config(state=state)
+        
+    def auto_tune_workers(self):
+        """Time worker/thread settings on the queued videos and keep the fastest"""
         if not self.video_queue:
-            messagebox.showwarning("No Videos", "Please add video files to the queue.")
+            messagebox.showwarning("No Videos", "Add some videos to the queue to calibrate with.")
             return
-            
-        self.process_button.config(state='disabled')
-        thread = threading.Thread(target=self.process_thread)
+        
+        self.set_busy(True)
+        options = self.read_settings()
+        thread = threading.Thread(target=self.auto_tune_thread, args=(list(self.video_queue), options))
         thread.daemon = True
         thread.start()
         
-    def process_thread(self):
-        total = len(self.video_queue)
-        position_percent = self.position_var.get()
-        quality = self.quality_var.get()
-        base_url = self.base_url_var.get().rstrip('/') + '/'
-        append_mode = self.append_mode_var.get()
+    def auto_tune_thread(self, video_paths, options):
+        try:
+            tuning = auto_tune.calibrate(video_paths, options['position_percent'],
+                                         seek_mode=options['seek_mode'], encoder=options['encoder'],
+                                         quality=options['quality'], on_status=self.set_status)
+            print(auto_tune.format_results(tuning))
+            auto_tune.save_tuning(tuning)
+            self.ui.call(self.workers_var.set, tuning['workers'])
+            self.set_status(f"Auto-tuned: {tuning['workers']} workers ({tuning['files_per_second']:.1f} files/s)")
+        except Exception as e:
+            self.set_status(f"Auto-tune failed: {e}")
+        finally:
+            self.ui.call(self.set_busy, False)
         
+    def read_settings(self):
+        """Read the theme settings from the form (main thread only; Tk isn't thread-safe)"""
         # Get output size if specified
         output_size = None
         try:
@@ -755,182 +608,91 @@ For full documentation, see:
         except (ValueError, AttributeError):
             pass
         
-        # Check for existing JSON if in append mode
-        existing_theme = None
-        existing_clips = []
-        existing_json_path = None
+        # Get poster format and optional size budget
+        target_kb = None
+        try:
+            if self.target_kb_var.get().strip():
+                target_kb = float(self.target_kb_var.get())
+                if target_kb <= 0:
+                    target_kb = None  # Not a usable size; use the quality setting
+        except ValueError:
+            pass
         
-        if append_mode and self.video_queue:
-            folder = Path(self.video_queue[0]).parent
-            existing_json_path = self.find_existing_json(folder)
-            
-            if existing_json_path:
-                existing_theme, existing_clips = self.load_existing_theme_data(existing_json_path)
-                if existing_theme:
-                    self.status_label.config(text=f"Appending to: {existing_json_path.name}")
-                else:
-                    self.status_label.config(text="Existing JSON found but invalid format")
-                    append_mode = False
-            else:
-                self.status_label.config(text="No existing JSON found - creating new theme")
-                append_mode = False
+        # Get worker count
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (ValueError, tk.TclError):
+            workers = 1
         
-        theme_data = existing_theme
-        clips = list(existing_clips) if existing_clips else []
-        errors = []
-        new_clips_count = 0
+        return {
+            'position_percent': self.position_var.get(),
+            'quality': self.quality_var.get(),
+            'seek_mode': self.seek_mode_var.get(),
+            'base_url': self.base_url_var.get(),
+            'append_mode': self.append_mode_var.get(),
+            'output_size': output_size,
+            'encoder': self.encoder_var.get(),
+            'target_kb': target_kb,
+            'workers': workers,
+            'trace': self.trace_var.get(),
+            'json_layout': self.json_layout_var.get(),
+            'shards': self.shards_var.get(),
+        }
         
-        for i, video_path in enumerate(self.video_queue):
-            self.status_label.config(text=f"Processing: {os.path.basename(video_path)}")
-            
-            try:
-                # Get XMP path
-                xmp_path = Path(video_path).with_suffix('.xmp')
-                
-                if not xmp_path.exists():
-                    errors.append(f"{os.path.basename(video_path)}: No XMP file found")
-                    continue
-                
-                # Check if this might be theme-demo by filename
-                is_theme_file = 'theme' in Path(video_path).stem.lower()
-                
-                # Parse XMP - look at frame 0 if theme file, frame 1+ otherwise
-                comp_title, marker_text = self.parse_xmp_metadata(xmp_path, look_for_theme=is_theme_file)
-                
-                if not marker_text:
-                    errors.append(f"{os.path.basename(video_path)}: No marker data found")
-                    continue
-                
-                # Parse marker
-                config = self.parse_simplified_marker(marker_text)
-                
-                if not config:
-                    errors.append(f"{os.path.basename(video_path)}: Could not parse marker")
-                    continue
-                
-                # Check if this is theme preview
-                if 'themeName' in config:
-                    if append_mode and existing_theme:
-                        # Skip theme processing in append mode
-                        self.status_label.config(text=f"Skipping theme video (using existing theme data)")
-                        continue
-                    
-                    theme_name = config['themeName']
-                    theme_id = self.generate_theme_id(theme_name)
-                    
-                    # Generate poster for theme preview
-                    success, poster_path = self.extract_poster(video_path, position_percent, quality, output_size)
-                    
-                    theme_data = {
-                        'id': theme_id,
-                        'name': theme_name,
-                        'description': config.get('themeDescription', ''),
-                        'previewUrl': base_url + os.path.basename(video_path),
-                        'posterUrl': base_url + os.path.basename(poster_path) if success else ''
-                    }
-                else:
-                    # This is a clip
-                    parsed_name = self.parse_comp_name(video_path)
-                    
-                    if not parsed_name:
-                        errors.append(f"{os.path.basename(video_path)}: Invalid filename format")
-                        continue
-                    
-                    # Check if clip already exists (by id)
-                    clip_id = Path(video_path).stem
-                    if any(c['id'] == clip_id for c in clips):
-                        self.status_label.config(text=f"Skipping {clip_id} (already exists)")
-                        continue
-                    
-                    # Generate poster
-                    success, poster_path = self.extract_poster(video_path, position_percent, quality, output_size)
-                    
-                    if not success:
-                        errors.append(f"{os.path.basename(video_path)}: {poster_path}")
-                        continue
-                    
-                    # Get duration
-                    duration = self.get_video_duration(video_path)
-                    
-                    # Get theme ID (from existing or new theme data)
-                    theme_id = theme_data['id'] if theme_data else 'any'
-                    
-                    # Build clip object
-                    clip = {
-                        'id': clip_id,
-                        'title': parsed_name['title'],
-                        'category': parsed_name['category'],
-                        'categoryOrder': parsed_name['categoryOrder'],
-                        'previewUrl': base_url + os.path.basename(video_path),
-                        'posterUrl': base_url + os.path.basename(poster_path),
-                        'themeId': theme_id,
-                        'defaultDuration': duration,
-                        'isOverlay': config.get('isOverlay', False),
-                        'tierRequirement': config.get('tierRequirement', 'Essential'),
-                        'triggersTierUpgrade': False,
-                        'requiresInput': config.get('requiresInput', len(config['customInputs']) > 0),
-                        'popupMessage': config.get('popupMessage', ''),
-                        'customInputs': config['customInputs']
-                    }
-                    
-                    clips.append(clip)
-                    new_clips_count += 1
-                
-            except Exception as e:
-                errors.append(f"{os.path.basename(video_path)}: {str(e)}")
-            
-            progress = ((i + 1) / total) * 100
-            self.progress_var.set(progress)
-        
-        # Build final JSON
-        if theme_data and clips:
-            # Update clip themeIds if needed
-            theme_id = theme_data['id']
-            for clip in clips:
-                if clip['themeId'] == 'any':
-                    clip['themeId'] = theme_id
-            
-            final_json = {
-                'theme': theme_data,
-                'clips': clips
-            }
-            
-            # Save JSON (overwrite existing if in append mode)
-            output_dir = Path(self.video_queue[0]).parent
-            
-            if append_mode and existing_json_path:
-                json_path = existing_json_path
-                status_msg = f"Updated: Added {new_clips_count} new clips (total: {len(clips)})"
-            else:
-                json_path = output_dir / f"{theme_id}.json"
-                status_msg = f"Complete: Generated {len(clips)} clips + theme JSON"
-            
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(final_json, f, indent=2, ensure_ascii=False)
-            
-            # Move XMP files to trash folder
-            self.move_xmp_to_trash(self.video_queue)
-            
-            self.status_label.config(text=status_msg)
+    def process_videos(self):
+        if not self.video_queue:
+            messagebox.showwarning("No Videos", "Please add video files to the queue.")
+            return
             
-            if errors:
-                error_msg = "\n".join(errors[:5])
-                if len(errors) > 5:
-                    error_msg += f"\n... and {len(errors) - 5} more errors"
-                messagebox.showwarning("Processing Complete with Errors", 
-                                     f"{status_msg}\n\nXMP files moved to xmp_trash/\n\nErrors:\n{error_msg}")
-                
-            else:
-                messagebox.showinfo("Success", 
-                                  f"{status_msg}\n\nXMP files moved to xmp_trash/\n\nSaved to: {json_path.name}")
-                
+        self.set_busy(True)
+        self.themes_label.config(text="")
+        
+        # One theme per folder; progress is tracked per theme
+        video_paths = list(self.video_queue)
+        self.theme_progress = {folder: 0.0 for folder in theme_builder.group_by_folder(video_paths)}
+        
+        options = self.read_settings()
+        thread = threading.Thread(target=self.process_thread, args=(video_paths, options))
+        thread.daemon = True
+        thread.start()
+        
+    def process_thread(self, video_paths, options):
+        workers = options['workers']
+        
+        # Optional stage trace, written next to the videos
+        tracer = None
+        if options['trace'] and video_paths:
+            trace_path = Path(video_paths[0]).parent / poster_trace.TRACE_NAME
+            tracer = poster_trace.TraceWriter(trace_path)
+        
+        # Keep 4K/8K sources within the default frame-memory budget
+        governor = poster_extractor.memory_governor(None, workers)
+        rss = memory_budget.PeakRSS()
+        
+        try:
+            results = theme_builder.build_themes(
+                video_paths, options['base_url'], options['position_percent'], options['quality'],
+                options['output_size'], append_mode=options['append_mode'], seek_mode=options['seek_mode'],
+                encoder=options['encoder'], target_kb=options['target_kb'],
+                on_status=self.set_theme_status, on_progress=self.set_theme_progress, tracer=tracer,
+                workers=workers, json_layout=options['json_layout'], shards=options['shards'],
+                threads=auto_tune.tuned_threads(auto_tune.load_tuning(), workers),
+                governor=governor, rss=rss)
+        finally:
+            if tracer is not None:
+                tracer.close()
+        
+        if tracer is not None and tracer.spans:
+            print(f"Stage trace written to {tracer.path}")
+            print(poster_trace.format_summary(poster_trace.summarize(tracer.spans)))
+        print(rss.format(governor))
+        
+        if len(results) == 1:
+            self.report_result(next(iter(results.values())))
         else:
-            if not theme_data:
-                messagebox.showerror("Error", "No theme data found. Make sure theme exists or add theme preview video with THEME-NAME marker.")
-            elif not clips:
-                messagebox.showerror("Error", "No valid clips processed.")
+            self.report_results(results)
         
-        self.process_button.config(state='normal')
+        self.ui.call(self.set_busy, False)
 
 
 def main():
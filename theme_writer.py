@@ -0,0 +1,165 @@
+"""Crash-safe theme JSON output.
+
+The theme JSON is streamed clip by clip to a temporary file next to the
+destination, fsynced and then renamed over it with os.replace, so a crash
+or full disk mid-write leaves the previous file intact instead of a
+truncated one.
+
+Layouts:
+
+- pretty:  indent=2, byte-identical to json.dump(..., indent=2) (default)
+- compact: no whitespace, for large themes served over the network
+
+With shards=True, the clips are also written as NDJSON, one file per
+category, under `<theme>.shards/`, next to an index.json holding the
+theme and the shard list, so consumers can load one category at a time.
+"""
+import json
+import os
+import re
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+LAYOUT_PRETTY = 'pretty'
+LAYOUT_COMPACT = 'compact'
+LAYOUTS = (LAYOUT_PRETTY, LAYOUT_COMPACT)
+
+SHARD_SUFFIX = '.shards'
+SHARD_INDEX_NAME = 'index.json'
+SHARD_VERSION = 1
+
+
+def fsync_dir(folder):
+    """Flush a rename in folder to disk, where the platform allows it"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    try:
+        fd = os.open(folder, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_open(path):
+    """Open a temporary file that replaces path only if the block completes"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    fsync_dir(path.parent)
+
+
+def write_document(f, theme, clips, layout=LAYOUT_PRETTY):
+    """Stream {"theme": ..., "clips": [...]} to f, one clip at a time"""
+    if layout == LAYOUT_COMPACT:
+        def dumps(obj, _):
+            return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+        head, sep, item, tail, empty = '{"theme":', ',"clips":[', ',', ']}', ']}'
+    elif layout == LAYOUT_PRETTY:
+        # Nested values are re-indented to their depth, matching indent=2
+        def dumps(obj, prefix):
+            return json.dumps(obj, ensure_ascii=False, indent=2).replace('\n', '\n' + prefix)
+        head, sep, item, tail, empty = '{\n  "theme": ', ',\n  "clips": [', ',', '\n  ]\n}', ']\n}'
+    else:
+        raise ValueError(f"Unknown JSON layout: {layout}")
+
+    f.write(head + dumps(theme, '  ') + sep)
+    count = 0
+    for clip in clips:
+        if layout == LAYOUT_PRETTY:
+            f.write((item if count else '') + '\n    ' + dumps(clip, '    '))
+        else:
+            f.write((item if count else '') + dumps(clip, ''))
+        count += 1
+    f.write(tail if count else empty)
+    return count
+
+
+def shard_name(category):
+    """File name for a category's NDJSON shard"""
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '-', str(category)).strip('-') or 'uncategorized'
+    return f"{slug}.ndjson"
+
+
+def write_shards(shard_dir, theme, clips):
+    """Write clips as one NDJSON file per category plus an index.json
+
+    Shards left over from categories that no longer exist are removed.
+    Returns the list of paths written.
+    """
+    shard_dir = Path(shard_dir)
+    shard_dir.mkdir(exist_ok=True)
+
+    by_category = {}
+    for clip in clips:
+        by_category.setdefault(clip.get('category'), []).append(clip)
+
+    written = []
+    shards = []
+    for category, category_clips in by_category.items():
+        name = shard_name(category)
+        # Categories differing only in punctuation must not share a file
+        suffix = 2
+        while any(path.name == name for path in written):
+            name = f"{shard_name(category)[:-len('.ndjson')]}-{suffix}.ndjson"
+            suffix += 1
+        path = shard_dir / name
+        with atomic_open(path) as f:
+            for clip in category_clips:
+                f.write(json.dumps(clip, ensure_ascii=False, separators=(',', ':')) + '\n')
+        shards.append({'category': category, 'file': path.name, 'clips': len(category_clips)})
+        written.append(path)
+
+    index_path = shard_dir / SHARD_INDEX_NAME
+    with atomic_open(index_path) as f:
+        json.dump({'version': SHARD_VERSION, 'theme': theme, 'shards': shards}, f,
+                  indent=2, ensure_ascii=False)
+    written.append(index_path)
+
+    current = {path.name for path in written}
+    for stale in shard_dir.glob('*.ndjson'):
+        if stale.name not in current:
+            try:
+                stale.unlink()
+            except OSError as e:
+                print(f"Error removing stale shard {stale.name}: {e}", file=sys.stderr)
+
+    return written
+
+
+def write_theme_json(json_path, theme, clips, layout=LAYOUT_PRETTY, shards=False):
+    """Atomically write the theme JSON (and optional category shards)
+
+    clips may be any iterable of clip dicts; it is consumed once unless
+    shards are requested. Returns the list of paths written, the theme
+    JSON first.
+    """
+    json_path = Path(json_path)
+    if shards:
+        clips = list(clips)
+
+    with atomic_open(json_path) as f:
+        write_document(f, theme, clips, layout)
+    written = [json_path]
+
+    if shards:
+        shard_dir = json_path.with_name(json_path.stem + SHARD_SUFFIX)
+        written.extend(write_shards(shard_dir, theme, clips))
+    return written
@@ -0,0 +1,52 @@
+"""Throttled, thread-safe Tk updates for the GUIs.
+
+Worker threads must not touch Tk widgets directly. They post updates to
+a UIUpdates queue instead, and the Tk main loop drains it every
+interval_ms via root.after. Keyed updates (status text, progress) are
+coalesced so only the latest value per key is applied on each drain;
+unkeyed calls (message boxes, re-enabling buttons) all run, in order.
+A batch therefore never waits on the UI, however many files it has.
+"""
+import queue
+
+# How often the main loop applies pending updates
+DRAIN_INTERVAL_MS = 100
+
+
+class UIUpdates:
+    def __init__(self, root, interval_ms=DRAIN_INTERVAL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._pending = queue.SimpleQueue()
+        self.root.after(self.interval_ms, self._drain)
+
+    def set(self, key, func, *args, **kwargs):
+        """Schedule func(*args, **kwargs); a later set() with the same key replaces it"""
+        self._pending.put((key, func, args, kwargs))
+
+    def call(self, func, *args, **kwargs):
+        """Schedule func(*args, **kwargs) to run on the main thread, after earlier updates"""
+        self._pending.put((None, func, args, kwargs))
+
+    def _drain(self):
+        # Collect everything posted so far, keeping only the latest keyed update
+        updates = []
+        latest = {}
+        while True:
+            try:
+                key, func, args, kwargs = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if key is not None:
+                if key in latest:
+                    updates[latest[key]] = None
+                latest[key] = len(updates)
+            updates.append((func, args, kwargs))
+
+        # Schedule the next drain first, so a modal dialog below doesn't stall updates
+        self.root.after(self.interval_ms, self._drain)
+
+        for update in updates:
+            if update is not None:
+                func, args, kwargs = update
+                func(*args, **kwargs)
@@ -1,25 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from tkinterdnd2 import DND_FILES, TkinterDnD
-import cv2
-from PIL import Image
 import os
-from pathlib import Path
 import threading
+from pathlib import Path
+
+import auto_tune
+import memory_budget
+import poster_extractor
+import poster_trace
+from poster_encoders import DEFAULT_ENCODER, available_encoders
+from poster_cache import PosterCache, poster_settings
+from ui_updates import UIUpdates
+from video_queue import VideoQueue, index_ranges
 
 
 class VideoPosterGenerator:
     def __init__(self, root):
         self.root = root
         self.root.title("Video Poster Generator")
-        self.root.geometry("800x600")
+        self.root.geometry("800x750")
         
         # Video queue
-        self.video_queue = []
+        self.video_queue = VideoQueue()
         
         # Create GUI
         self.create_widgets()
         
+        # Worker threads post widget updates here; the main loop applies them
+        self.ui = UIUpdates(root)
+        
     def create_widgets(self):
         # Main container
         main_frame = ttk.Frame(self.root, padding="10")
@@ -60,8 +70,8 @@ class VideoPosterGenerator:
         
         ttk.Label(settings_frame, text="(25% = 0.25s into 1s video, 2s into 8s video)").grid(row=0, column=2, sticky=tk.W, padx=(10, 0))
         
-        # JPEG Quality setting
-        ttk.Label(settings_frame, text="JPEG Quality:").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        # Quality setting
+        ttk.Label(settings_frame, text="Quality:").grid(row=1, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
         
         # Quality presets with radio buttons
         self.quality_var = tk.IntVar(value=85)
@@ -115,6 +125,78 @@ class VideoPosterGenerator:
         ttk.Entry(size_frame, textvariable=self.height_var, width=8).grid(row=0, column=3, padx=(5, 0))
         ttk.Label(size_frame, text="(leave blank for original size)").grid(row=0, column=4, padx=(10, 0))
         
+        # Parallel workers
+        ttk.Label(settings_frame, text="Parallel Workers:").grid(row=3, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        workers_frame = ttk.Frame(settings_frame)
+        workers_frame.grid(row=3, column=1, sticky=tk.W, pady=(10, 0))
+        
+        # Start from the setting auto_tune saved for this machine, if any
+        tuning = auto_tune.load_tuning()
+        self.workers_var = tk.IntVar(value=tuning['workers'] if tuning else os.cpu_count() or 1)
+        ttk.Spinbox(workers_frame, from_=1, to=64, textvariable=self.workers_var, width=6).grid(row=0, column=0)
+        self.auto_tune_button = ttk.Button(workers_frame, text="Auto-tune", command=self.auto_tune_workers)
+        self.auto_tune_button.grid(row=0, column=1, padx=(10, 0))
+        ttk.Label(workers_frame, text="(1 = process one file at a time)").grid(row=0, column=2, padx=(10, 0))
+        
+        # Seek mode
+        ttk.Label(settings_frame, text="Seek Mode:").grid(row=4, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        seek_frame = ttk.Frame(settings_frame)
+        seek_frame.grid(row=4, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.seek_mode_var = tk.StringVar(value=poster_extractor.SEEK_EXACT)
+        ttk.Radiobutton(seek_frame, text="Exact frame", variable=self.seek_mode_var,
+                       value=poster_extractor.SEEK_EXACT).grid(row=0, column=0, padx=(0, 10))
+        ttk.Radiobutton(seek_frame, text="Nearest keyframe (faster)", variable=self.seek_mode_var,
+                       value=poster_extractor.SEEK_KEYFRAME).grid(row=0, column=1, padx=(0, 10))
+        
+        # Extra positions and contact sheet
+        ttk.Label(settings_frame, text="Extra Positions (%):").grid(row=5, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        extra_frame = ttk.Frame(settings_frame)
+        extra_frame.grid(row=5, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.extra_positions_var = tk.StringVar()
+        ttk.Entry(extra_frame, textvariable=self.extra_positions_var, width=20).grid(row=0, column=0)
+        ttk.Label(extra_frame, text="(e.g. 10, 50, 75 - saved as -poster-10.jpg ...)").grid(row=0, column=1, padx=(10, 0))
+        
+        self.contact_sheet_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(extra_frame, text="Contact sheet",
+                       variable=self.contact_sheet_var).grid(row=0, column=2, padx=(10, 0))
+        
+        # Poster frame selection
+        ttk.Label(settings_frame, text="Poster Frame:").grid(row=6, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        poster_mode_frame = ttk.Frame(settings_frame)
+        poster_mode_frame.grid(row=6, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.poster_mode_var = tk.StringVar(value=poster_extractor.POSTER_FIXED)
+        ttk.Radiobutton(poster_mode_frame, text="Exact position", variable=self.poster_mode_var,
+                       value=poster_extractor.POSTER_FIXED).grid(row=0, column=0, padx=(0, 10))
+        ttk.Radiobutton(poster_mode_frame, text="Auto (sharpest non-black frame near position)",
+                       variable=self.poster_mode_var,
+                       value=poster_extractor.POSTER_AUTO).grid(row=0, column=1, padx=(0, 10))
+        
+        # Output format
+        ttk.Label(settings_frame, text="Output Format:").grid(row=7, column=0, sticky=tk.W, padx=(0, 10), pady=(10, 0))
+        format_frame = ttk.Frame(settings_frame)
+        format_frame.grid(row=7, column=1, columnspan=2, sticky=tk.W, pady=(10, 0))
+        
+        self.encoder_var = tk.StringVar(value=DEFAULT_ENCODER)
+        ttk.Combobox(format_frame, textvariable=self.encoder_var, values=available_encoders(),
+                    state='readonly', width=18).grid(row=0, column=0)
+        ttk.Label(format_frame, text="Target size (KB):").grid(row=0, column=1, padx=(10, 0))
+        self.target_kb_var = tk.StringVar()
+        ttk.Entry(format_frame, textvariable=self.target_kb_var, width=8).grid(row=0, column=2, padx=(5, 0))
+        ttk.Label(format_frame, text="(optional - overrides quality)").grid(row=0, column=3, padx=(10, 0))
+        
+        # Incremental cache
+        self.skip_unchanged_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(settings_frame, text="Skip videos whose poster is already up to date",
+                       variable=self.skip_unchanged_var).grid(row=8, column=0, columnspan=3, sticky=tk.W, pady=(10, 0))
+        
+        # Stage tracing
+        self.trace_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(settings_frame, text=f"Write per-stage timings to {poster_trace.TRACE_NAME} (for diagnosing slow batches)",
+                       variable=self.trace_var).grid(row=9, column=0, columnspan=3, sticky=tk.W, pady=(5, 0))
+        
         # Drop Zone Frame
         drop_frame = ttk.LabelFrame(main_frame, text="Drop Video Files Here or Click to Browse", padding="10")
         drop_frame.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -225,11 +307,11 @@ class VideoPosterGenerator:
             
     def add_files(self, files):
         """Add files to the queue"""
-        for file in files:
-            file = file.strip('{}')  # Remove curly braces from drag-drop
-            if file.lower().endswith('.mp4') and file not in self.video_queue:
-                self.video_queue.append(file)
-                self.video_listbox.insert(tk.END, os.path.basename(file))
+        files = [file.strip('{}') for file in files]  # Remove curly braces from drag-drop
+        added = self.video_queue.add_many(file for file in files if file.lower().endswith('.mp4'))
+        if added:
+            # One Tk call for the whole batch
+            self.video_listbox.insert(tk.END, *[os.path.basename(file) for file in added])
                 
     def clear_queue(self):
         """Clear all videos from queue"""
@@ -239,137 +321,232 @@ class VideoPosterGenerator:
     def remove_selected(self):
         """Remove selected items from queue"""
         selected = self.video_listbox.curselection()
-        for index in reversed(selected):
-            self.video_queue.pop(index)
-            self.video_listbox.delete(index)
+        self.video_queue.remove_indices(selected)
+        for first, last in index_ranges(selected):
+            self.video_listbox.delete(first, last)
             
     def is_split_screen(self, width, height):
         """Detect if video is split-screen format (width ≈ 2x height)"""
-        ratio = width / height if height > 0 else 0
-        return ratio >= 1.8  # Auto-detect split screen
+        return poster_extractor.is_split_screen(width, height)
         
-    def extract_poster(self, video_path, position_percent, quality, output_size=None):
+    def extract_poster(self, video_path, position_percent, quality, output_size=None,
+                       seek_mode=poster_extractor.SEEK_EXACT, stats=None):
         """Extract poster frame from video"""
-        try:
-            # Open video
-            cap = cv2.VideoCapture(video_path)
-            
-            if not cap.isOpened():
-                return False, "Could not open video file"
-                
-            # Get video properties
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            
-            if total_frames <= 0 or fps <= 0:
-                cap.release()
-                return False, "Invalid video properties"
-            
-            # Calculate frame number based on percentage
-            frame_number = int((position_percent / 100.0) * total_frames)
-            # Ensure frame number is within bounds
-            frame_number = max(0, min(frame_number, total_frames - 1))
-                
-            # Set frame position
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            
-            # Read frame
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret:
-                return False, "Could not read frame at specified position"
-                
-            # Convert BGR to RGB
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            height, width = frame.shape[:2]
+        return poster_extractor.extract_poster(video_path, position_percent, quality, output_size,
+                                               seek_mode=seek_mode, stats=stats)
             
-            # Check for split-screen and crop if needed
-            if self.is_split_screen(width, height):
-                frame = frame[:, :width//2]  # Take left 50%
-                
-            # Convert to PIL Image
-            img = Image.fromarray(frame)
-            
-            # Resize if output size specified
-            if output_size:
-                img = img.resize(output_size, Image.LANCZOS)
-                
-            # Generate output filename
-            path = Path(video_path)
-            output_path = path.parent / f"{path.stem}-poster.jpg"
+    def set_status(self, text):
+        """Show text in the status line (safe to call from the worker thread)"""
+        self.ui.set('status', self.status_label.config, text=text)
+        
+    def set_progress(self, percent):
+        """Move the progress bar (safe to call from the worker thread)"""
+        self.ui.set('progress', self.progress_var.set, percent)
+        
+    def set_busy(self, busy):
+        """Disable Generate and Auto-tune while a batch or a calibration runs, so only one runs at a time"""
+        state = 'disabled' if busy else 'normal'
+        self.process_button.config(state=state)
+        self.auto_tune_button.config(state=state)
+        
+    def auto_tune_workers(self):
+        """Time worker/thread settings on the queued videos and keep the fastest"""
+        if not self.video_queue:
+            messagebox.showwarning("No Videos", "Add some videos to the queue to calibrate with.")
+            return
+        
+        self.set_busy(True)
+        options = self.read_settings()
+        thread = threading.Thread(target=self.auto_tune_thread, args=(list(self.video_queue), options))
+        thread.daemon = True
+        thread.start()
+        
+    def auto_tune_thread(self, video_paths, options):
+        try:
+            tuning = auto_tune.calibrate(video_paths, options['position_percent'],
+                                         seek_mode=options['seek_mode'], encoder=options['encoder'],
+                                         quality=options['quality'], on_status=self.set_status)
+            print(auto_tune.format_results(tuning))
+            auto_tune.save_tuning(tuning)
+            self.ui.call(self.workers_var.set, tuning['workers'])
+            self.set_status(f"Auto-tuned: {tuning['workers']} workers ({tuning['files_per_second']:.1f} files/s)")
+        except Exception as e:
+            self.set_status(f"Auto-tune failed: {e}")
+        finally:
+            self.ui.call(self.set_busy, False)
+        
+    def read_settings(self):
+        """Read the poster settings from the form (main thread only; Tk isn't thread-safe)"""
+        # Get output size if specified
+        output_size = None
+        try:
+            width = self.width_var.get().strip()
+            height = self.height_var.get().strip()
+            if width and height:
+                output_size = (int(width), int(height))
+        except (ValueError, AttributeError):
+            pass
             
-            # Save as JPEG with specified quality
-            img.save(output_path, 'JPEG', quality=quality)
+        # Get poster format and optional size budget
+        target_kb = None
+        try:
+            if self.target_kb_var.get().strip():
+                target_kb = float(self.target_kb_var.get())
+                if target_kb <= 0:
+                    target_kb = None  # Not a usable size; use the quality setting
+        except ValueError:
+            pass
             
-            return True, str(output_path)
+        # Get extra positions if specified
+        extra_positions = []
+        for part in self.extra_positions_var.get().split(','):
+            try:
+                if part.strip():
+                    extra_positions.append(max(0, min(100, float(part))))
+            except ValueError:
+                pass
             
-        except Exception as e:
-            return False, str(e)
+        # Get worker count
+        try:
+            workers = max(1, int(self.workers_var.get()))
+        except (ValueError, tk.TclError):
+            workers = 1
             
+        return {
+            'position_percent': self.position_var.get(),
+            'quality': self.quality_var.get(),
+            'seek_mode': self.seek_mode_var.get(),
+            'poster_mode': self.poster_mode_var.get(),
+            'output_size': output_size,
+            'encoder': self.encoder_var.get(),
+            'target_kb': target_kb,
+            'extra_positions': extra_positions,
+            'contact_sheet': self.contact_sheet_var.get() and bool(extra_positions),
+            'workers': workers,
+            'skip_unchanged': self.skip_unchanged_var.get(),
+            'trace': self.trace_var.get(),
+        }
+        
     def process_videos(self):
         """Process all videos in queue"""
         if not self.video_queue:
             messagebox.showwarning("No Videos", "Please add video files to the queue.")
             return
             
-        # Disable process button during processing
-        self.process_button.config(state='disabled')
+        # Disable the buttons during processing
+        self.set_busy(True)
         
-        # Run processing in separate thread
-        thread = threading.Thread(target=self.process_thread)
+        # Run processing in separate thread, with the queue and settings as they are now
+        options = self.read_settings()
+        thread = threading.Thread(target=self.process_thread, args=(list(self.video_queue), options))
         thread.daemon = True
         thread.start()
         
-    def process_thread(self):
+    def process_thread(self, video_paths, options):
         """Thread for processing videos"""
-        total = len(self.video_queue)
+        total = len(video_paths)
         success_count = 0
-        errors = []
         
         # Get settings
-        position_percent = self.position_var.get()
-        quality = self.quality_var.get()
-        
-        # Get output size if specified
-        output_size = None
-        try:
-            width = self.width_var.get().strip()
-            height = self.height_var.get().strip()
-            if width and height:
-                output_size = (int(width), int(height))
-        except (ValueError, AttributeError):
-            pass
+        position_percent = options['position_percent']
+        quality = options['quality']
+        seek_mode = options['seek_mode']
+        poster_mode = options['poster_mode']
+        output_size = options['output_size']
+        encoder = options['encoder']
+        target_kb = options['target_kb']
+        extra_positions = options['extra_positions']
+        contact_sheet = options['contact_sheet']
+        workers = options['workers']
             
-        for i, video_path in enumerate(self.video_queue):
+        # Results may arrive out of order, so remember each file's queue position
+        queue_index = {video_path: i for i, video_path in enumerate(video_paths)}
+        errors_by_index = []
+        seek_times = []
+        
+        # Skip posters whose source and settings are unchanged since the last run
+        cache = PosterCache()
+        settings = poster_settings(position_percent, quality, output_size,
+                                   poster_extractor.resolve_seek_mode(seek_mode),
+                                   extra_positions, contact_sheet, poster_mode,
+                                   encoder, target_kb)
+        if options['skip_unchanged']:
+            stale, fresh = cache.split_stale(video_paths, settings)
+        else:
+            stale, fresh = video_paths, []
+        skipped_count = len(fresh)
+        success_count += skipped_count
+        
+        if workers > 1:
+            self.set_status(f"Processing with {workers} workers...")
+        
+        # Optional stage trace, written next to the videos
+        tracer = None
+        if options['trace'] and stale:
+            tracer = poster_trace.TraceWriter(Path(stale[0]).parent / poster_trace.TRACE_NAME)
+        
+        # Keep 4K/8K sources within the default frame-memory budget
+        governor = poster_extractor.memory_governor(None, workers)
+        rss = memory_budget.PeakRSS()
+        
+        results = poster_extractor.run_batch(stale, position_percent, quality, output_size,
+                                             workers=workers, tracer=tracer, seek_mode=seek_mode,
+                                             threads=auto_tune.tuned_threads(auto_tune.load_tuning(), workers),
+                                             governor=governor, rss=rss,
+                                             extra_positions=extra_positions,
+                                             contact_sheet=contact_sheet,
+                                             poster_mode=poster_mode,
+                                             encoder=encoder, target_kb=target_kb)
+        for done, (video_path, success, result, stats) in enumerate(results, start=skipped_count + 1):
             # Update status
-            self.status_label.config(text=f"Processing: {os.path.basename(video_path)}")
+            self.set_status(f"Processed {done}/{total}: {os.path.basename(video_path)}")
             
-            # Process video
-            success, result = self.extract_poster(video_path, position_percent, quality, output_size)
+            # Report seek cost per file
+            if 'seek_ms' in stats:
+                seek_times.append(stats['seek_ms'])
+                print(f"{os.path.basename(video_path)}: {poster_extractor.format_seek(stats)}")
             
             if success:
                 success_count += 1
+                cache.record(video_path, settings, result,
+                             poster_extractor.used_seek_mode(stats, seek_mode),
+                             poster_extractor.output_paths(result, stats))
             else:
-                errors.append(f"{os.path.basename(video_path)}: {result}")
+                errors_by_index.append((queue_index[video_path], f"{os.path.basename(video_path)}: {result}"))
                 
             # Update progress
-            progress = ((i + 1) / total) * 100
-            self.progress_var.set(progress)
+            progress = (done / total) * 100
+            self.set_progress(progress)
             
+        # Report errors in queue order regardless of completion order
+        errors = [message for _, message in sorted(errors_by_index)]
+        cache.save()
+        if tracer is not None:
+            tracer.close()
+            if tracer.spans:
+                print(f"Stage trace written to {tracer.path}")
+                print(poster_trace.format_summary(poster_trace.summarize(tracer.spans)))
+        if stale:
+            print(rss.format(governor))
+        
         # Processing complete
-        self.status_label.config(text=f"Complete: {success_count}/{total} successful")
-        self.process_button.config(state='normal')
+        status_msg = f"Complete: {success_count}/{total} successful"
+        if skipped_count:
+            status_msg += f", {skipped_count} up to date"
+        if seek_times:
+            status_msg += f" (avg seek {sum(seek_times) / len(seek_times):.1f} ms)"
+        self.set_status(status_msg)
+        self.ui.call(self.set_busy, False)
         
         # Show results
         if errors:
             error_msg = "\n".join(errors[:10])  # Show first 10 errors
             if len(errors) > 10:
                 error_msg += f"\n... and {len(errors) - 10} more errors"
-            messagebox.showwarning("Processing Complete with Errors", 
-                                 f"Successfully processed {success_count}/{total} videos.\n\nErrors:\n{error_msg}")
+            self.ui.call(messagebox.showwarning, "Processing Complete with Errors", 
+                         f"Successfully processed {success_count}/{total} videos.\n\nErrors:\n{error_msg}")
         else:
-            messagebox.showinfo("Success", f"Successfully generated {success_count} poster images!")
+            self.ui.call(messagebox.showinfo, "Success", f"Successfully generated {success_count} poster images!")
 
 
 def main():
@@ -0,0 +1,59 @@
+"""Ordered, set-indexed video queue shared by the GUIs.
+
+Membership checks are O(1) through a set kept alongside the ordered list,
+so dropping tens of thousands of files stays linear, and removing a
+selection rebuilds the list once instead of popping index by index.
+"""
+
+
+class VideoQueue:
+    def __init__(self, paths=()):
+        self._paths = []
+        self._members = set()
+        self.add_many(paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __contains__(self, path):
+        return path in self._members
+
+    def __getitem__(self, index):
+        return self._paths[index]
+
+    def add_many(self, paths):
+        """Append paths not already queued, returning the ones added in order"""
+        added = []
+        for path in paths:
+            if path not in self._members:
+                self._members.add(path)
+                added.append(path)
+        self._paths.extend(added)
+        return added
+
+    def remove_indices(self, indices):
+        """Remove the entries at the given positions in one pass"""
+        doomed = set(indices)
+        if not doomed:
+            return
+        kept = [path for i, path in enumerate(self._paths) if i not in doomed]
+        self._members.difference_update(path for i, path in enumerate(self._paths) if i in doomed)
+        self._paths = kept
+
+    def clear(self):
+        self._paths.clear()
+        self._members.clear()
+
+
+def index_ranges(indices):
+    """Group indices into (first, last) runs, last run first, for range deletes"""
+    ranges = []
+    for index in sorted(indices):
+        if ranges and index == ranges[-1][1] + 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return [tuple(run) for run in reversed(ranges)]
@@ -0,0 +1,183 @@
+"""Watch-folder mode: pick up new exports from a drop folder as they land.
+
+FolderWatcher polls with os.scandir snapshots, so no file-system
+notification service is needed. Each poll costs one stat per watched
+directory plus one per known video and settling file: a directory is
+only listed again when its mtime changes. Known videos are re-statted
+because overwriting a file in place leaves the directory's mtime alone.
+
+A video is ready once its size and mtime have stopped changing for
+settle_seconds (so half-written exports are left alone) and, with
+require_xmp, once its .xmp sidecar exists and has settled too. Each
+ready video is handed out once; a re-export (new size or mtime) makes it
+ready again.
+"""
+import os
+import time
+from pathlib import Path
+
+VIDEO_SUFFIX = '.mp4'
+SIDECAR_SUFFIX = '.xmp'
+
+# Seconds a file's size and mtime must stay unchanged before it is used
+SETTLE_SECONDS = 2.0
+POLL_INTERVAL = 1.0
+BATCH_SIZE = 8
+
+# Folders the tools write into themselves, never watched
+IGNORED_DIRS = ('xmp_trash',)
+
+
+class FolderWatcher:
+    def __init__(self, folders, recursive=False, settle_seconds=SETTLE_SECONDS, require_xmp=True,
+                 include_existing=False, clock=time.monotonic):
+        self.folders = [Path(folder) for folder in folders]
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.require_xmp = require_xmp
+        self.clock = clock
+
+        self._listings = {}   # dir -> (mtime_ns, {name: (size, mtime_ns)}, [subdirs])
+        self._changed = {}    # file path -> (signature, clock time it last changed)
+        self._done = {}       # video path -> mp4 signature when handed out
+        self._retry = {}      # dir -> video paths to offer again
+        self._woken = set()   # dirs whose retries go out on the next poll
+
+        if not include_existing:
+            for folder, files in self._scan():
+                for name, signature in files.items():
+                    if name.lower().endswith(VIDEO_SUFFIX):
+                        self._done[str(folder / name)] = signature
+
+    def _list(self, folder):
+        """List folder, reusing the previous listing if its mtime is unchanged"""
+        try:
+            mtime_ns = os.stat(folder).st_mtime_ns
+        except OSError:
+            self._listings.pop(folder, None)
+            return None
+        cached = self._listings.get(folder)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached
+
+        files = {}
+        subdirs = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    name = entry.name
+                    if name.startswith('.'):
+                        continue
+                    try:
+                        if entry.is_dir():
+                            if self.recursive and name not in IGNORED_DIRS and not name.endswith('.shards'):
+                                subdirs.append(Path(entry.path))
+                        elif name.lower().endswith((VIDEO_SUFFIX, SIDECAR_SUFFIX)):
+                            stat = entry.stat()
+                            files[name] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        except OSError:
+            return None
+        listing = (mtime_ns, files, subdirs)
+        self._listings[folder] = listing
+        return listing
+
+    def _scan(self):
+        """Yield (folder, {name: signature}) for every watched folder"""
+        stack = list(reversed(self.folders))
+        while stack:
+            folder = stack.pop()
+            listing = self._list(folder)
+            if listing is None:
+                continue
+            _, files, subdirs = listing
+            # Files still settling, and videos re-exported in place, change
+            # without touching the folder's mtime
+            for name in files:
+                path = str(folder / name)
+                if path in self._changed or path in self._done:
+                    try:
+                        stat = os.stat(path)
+                        files[name] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        pass
+            yield folder, files
+            stack.extend(reversed(subdirs))
+
+    def _settled(self, path, signature, now):
+        """True once path's signature has held for settle_seconds"""
+        previous = self._changed.get(path)
+        if previous is None or previous[0] != signature:
+            self._changed[path] = (signature, now)
+            return False
+        return signature[0] > 0 and now - previous[1] >= self.settle_seconds
+
+    def poll(self):
+        """Return the videos that became ready since the last poll, in folder and name order"""
+        now = self.clock()
+        ready = []
+        present = set()
+        for folder, files in self._scan():
+            folder_ready = []
+            for name in sorted(files):
+                if not name.lower().endswith(VIDEO_SUFFIX):
+                    continue
+                path = str(folder / name)
+                signature = files[name]
+                present.add(path)
+                if self._done.get(path) == signature:
+                    continue
+                sidecar_name = name[:-len(VIDEO_SUFFIX)] + SIDECAR_SUFFIX
+                settled = self._settled(path, signature, now)
+                if self.require_xmp:
+                    sidecar = files.get(sidecar_name)
+                    sidecar_path = str(folder / sidecar_name)
+                    present.add(sidecar_path)
+                    if sidecar is None:
+                        continue
+                    settled = self._settled(sidecar_path, sidecar, now) and settled
+                if settled:
+                    folder_ready.append(path)
+                    self._done[path] = signature
+                    self._changed.pop(path, None)
+                    self._changed.pop(str(folder / sidecar_name), None)
+
+            if folder_ready or folder in self._woken:
+                retry = [path for path in self._retry.pop(folder, ()) if path in present]
+                folder_ready = sorted(set(folder_ready) | set(retry))
+            ready.extend(folder_ready)
+
+        self._woken.clear()
+        # Forget files that disappeared before settling
+        for path in [path for path in self._changed if path not in present]:
+            del self._changed[path]
+        return ready
+
+    def retry(self, video_paths):
+        """Offer videos again with the next ready video in their folder (or after wake())"""
+        for video_path in video_paths:
+            self._retry.setdefault(Path(video_path).parent, set()).add(str(video_path))
+
+    def wake(self, folder):
+        """Offer folder's retried videos again on the next poll"""
+        self._woken.add(Path(folder))
+
+
+def watch(watcher, handle_batch, interval=POLL_INTERVAL, batch_size=BATCH_SIZE, stop=None):
+    """Poll watcher until stop (a threading.Event) is set or Ctrl+C
+
+    Ready videos are passed to handle_batch(video_paths) in batches of at
+    most batch_size.
+    """
+    try:
+        while stop is None or not stop.is_set():
+            ready = watcher.poll()
+            for start in range(0, len(ready), batch_size):
+                handle_batch(ready[start:start + batch_size])
+            if stop is not None:
+                stop.wait(interval)
+            else:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        pass